@@ -0,0 +1,197 @@
+import argparse
+import os
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+
+try:
+    import bpy
+    import addon_utils
+except ImportError:
+    # Outside Blender only the layout and parse checks run
+    bpy = None
+
+# Checks the native PSKX reader against real UModel exports. The synthetic depot from
+# generate_depot.py is written with the reader's own dtypes, so it cannot catch a wrong layout.
+#   python benchmarks/check_reader.py <file.pskx> ...
+#       compares the reader's record sizes with the PSK format and parses the files
+#   blender -b --factory-startup --python benchmarks/check_reader.py -- <file.pskx> ...
+#       also imports every file with pskimport and compares faces, winding, UVs and materials
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PSK_ADDON = "io_import_scene_unreal_psa_psk_280"
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Record sizes from the PSK format (UModel's Psk.h), not from the reader
+PSK_RECORD_SIZES = {
+    'CHUNK_HEADER': 32,
+    'POINT_DTYPE': 12,
+    'WEDGE16_DTYPE': 16,
+    'WEDGE32_DTYPE': 16,
+    'FACE16_DTYPE': 12,
+    'FACE32_DTYPE': 18,
+    'MATERIAL_DTYPE': 88,
+    'EXTRA_UV_DTYPE': 8,
+    'NORMAL_DTYPE': 12,
+}
+CHUNK_RECORD_SIZES = {
+    b'PNTS0000': 12,
+    b'VTXW0000': 16,
+    b'FACE0000': 12,
+    b'FACE3200': 18,
+    b'MATT0000': 88,
+    b'VTXNORMS': 12,
+}
+POSITION_DECIMALS = 4
+UV_DECIMALS = 4
+SUFFIX_PATTERN = re.compile(r"\.\d{3}$")
+
+def check_record_sizes(pskx_reader):
+    problems = []
+    for name, size in PSK_RECORD_SIZES.items():
+        itemsize = getattr(pskx_reader, name).itemsize
+        if itemsize != size:
+            problems.append(f"{name} is {itemsize} bytes, the PSK format has {size}")
+    return problems
+
+def check_chunks(pskx_reader, path):
+    with open(path, 'rb') as file:
+        buffer = file.read()
+    problems = []
+    for chunk_id, data_size, data_count, offset in pskx_reader.iter_chunks(buffer):
+        expected = CHUNK_RECORD_SIZES.get(chunk_id)
+        if chunk_id.startswith(b'EXTRAUV'):
+            expected = 8
+        if expected is not None and data_count and data_size != expected:
+            problems.append(f"chunk {chunk_id!r} has {data_size} byte records, expected {expected}")
+        print(f"    {chunk_id.decode('latin-1'):<12} {data_count:>8} x {data_size} bytes")
+    return problems
+
+# World space corner positions, first UV set and material name of every triangle of a mesh object
+def read_faces(obj):
+    mesh = obj.data
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", positions)
+    positions = positions.reshape(-1, 3)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    positions = positions @ matrix[:3, :3].T + matrix[:3, 3]
+
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    if len(loop_totals) and (loop_totals != 3).any():
+        raise ValueError(f"{obj.name} has faces that are not triangles")
+    corners = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", corners)
+    uvs = np.zeros(len(mesh.loops) * 2, dtype=np.float64)
+    if mesh.uv_layers:
+        mesh.uv_layers[0].data.foreach_get("uv", uvs)
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_indices)
+    slot_names = [SUFFIX_PATTERN.sub("", material.name) if material else "" for material in mesh.materials]
+
+    face_positions = np.round(positions[corners].reshape(-1, 3, 3), POSITION_DECIMALS)
+    face_uvs = np.round(uvs.reshape(-1, 3, 2), UV_DECIMALS)
+    face_materials = [slot_names[index] if index < len(slot_names) else "" for index in material_indices]
+    return face_positions, face_uvs, face_materials
+
+# Faces as comparable tuples. Each face starts at its smallest corner so the same triangle matches
+# whatever corner a mesh starts it at, while the winding is kept. Degenerate faces are left out.
+def face_keys(face_positions, face_uvs, face_materials, reverse_winding=False, flip_v=False):
+    if reverse_winding:
+        face_positions = face_positions[:, ::-1]
+        face_uvs = face_uvs[:, ::-1]
+    if flip_v:
+        face_uvs = face_uvs.copy()
+        face_uvs[:, :, 1] = np.round(1.0 - face_uvs[:, :, 1], UV_DECIMALS)
+    keys = Counter()
+    for positions, uvs, material in zip(face_positions.tolist(), face_uvs.tolist(), face_materials):
+        corners = [tuple(position) + tuple(uv) for position, uv in zip(positions, uvs)]
+        if len({corner[:3] for corner in corners}) < 3:
+            continue
+        start = corners.index(min(corners))
+        keys[tuple(corners[start:] + corners[:start]) + (material,)] += 1
+    return keys
+
+def import_with_pskimport(path):
+    from io_import_scene_unreal_psa_psk_280 import pskimport
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    pskimport(path, bReorientBones=False)
+    objects = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
+    if len(objects) != 1:
+        raise ValueError(f"pskimport made {len(objects)} mesh objects")
+    return objects[0]
+
+def compare_with_pskimport(path):
+    from medge_depot_builder.pskx_reader import read_pskx
+    from medge_depot_builder.mesh_builder import MeshArrays, build_mesh
+
+    reference = import_with_pskimport(path)
+    native = bpy.data.objects.new("native_check", build_mesh("native_check", MeshArrays(read_pskx(path))))
+    try:
+        expected = face_keys(*read_faces(reference))
+        faces = read_faces(native)
+        if face_keys(*faces) == expected:
+            print(f"    matches pskimport, {sum(expected.values())} faces")
+            return []
+        # Name the most likely cause: the variant of the native faces that matches best
+        variants = {
+            "reversed winding": face_keys(*faces, reverse_winding=True),
+            "flipped V": face_keys(*faces, flip_v=True),
+            "reversed winding and flipped V": face_keys(*faces, reverse_winding=True, flip_v=True),
+        }
+        for name, keys in variants.items():
+            if keys == expected:
+                return [f"faces match pskimport only with {name}"]
+        matching = sum((face_keys(*faces) & expected).values())
+        return [f"{matching} of {sum(expected.values())} pskimport faces match the native mesh"]
+    finally:
+        for obj in (native, reference):
+            mesh = obj.data
+            bpy.data.objects.remove(obj)
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check the native PSKX reader against real UModel exports and pskimport")
+    parser.add_argument('files', nargs='+', help="*.pskx files exported by UModel")
+    # Blender's own arguments come before the '--' separator
+    if bpy is not None:
+        argv = argv[argv.index('--') + 1:] if '--' in argv else []
+    else:
+        argv = argv[1:]
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args(sys.argv)
+    if bpy is not None:
+        addon_utils.enable(PSK_ADDON, default_set=False)
+    from medge_depot_builder import pskx_reader
+
+    failures = 0
+    problems = check_record_sizes(pskx_reader)
+    for problem in problems:
+        print(f"Reader layout: {problem}")
+    failures += len(problems)
+
+    for path in args.files:
+        print(path)
+        try:
+            problems = check_chunks(pskx_reader, path)
+            pskx_reader.read_pskx(path)
+            if bpy is not None:
+                problems += compare_with_pskimport(path)
+        except Exception as e:
+            problems = [f"{type(e).__name__}: {e}"]
+        for problem in problems:
+            print(f"    {problem}")
+        failures += bool(problems)
+
+    print(f"{len(args.files)} files checked, {failures} problems")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
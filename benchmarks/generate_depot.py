@@ -0,0 +1,179 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import zlib
+import numpy as np
+
+# The chunk layouts come from the addon's own reader so generated files always match what it parses
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from medge_depot_builder.pskx_reader import (CHUNK_HEADER, POINT_DTYPE, WEDGE16_DTYPE, WEDGE32_DTYPE,
+                                             FACE16_DTYPE, FACE32_DTYPE, MATERIAL_DTYPE, EXTRA_UV_DTYPE)
+
+# Writes a synthetic depot laid out like a UModel export:
+#   <Package>/<Group>/StaticMesh3/*.pskx, Material3/*.mat and Texture2D/*.png
+# Usage: python generate_depot.py <output folder> [--packages 20 --groups 4 --meshes 25 ...]
+
+CHUNK_TYPE_FLAG = 0x1e83b9
+TEXTURE_ROLES = ('Diffuse', 'Specular', 'Normal')
+
+def chunk(chunk_id, items):
+    header = np.zeros(1, dtype=CHUNK_HEADER)
+    header['chunk_id'] = chunk_id
+    header['type_flag'] = CHUNK_TYPE_FLAG
+    header['data_size'] = items.dtype.itemsize
+    header['data_count'] = len(items)
+    return header.tobytes() + items.tobytes()
+
+def empty_chunk(chunk_id, item_size):
+    header = np.zeros(1, dtype=CHUNK_HEADER)
+    header['chunk_id'] = chunk_id
+    header['type_flag'] = CHUNK_TYPE_FLAG
+    header['data_size'] = item_size
+    return header.tobytes()
+
+# A wavy grid with one wedge per point, split into two smoothing groups and one section per material
+def build_pskx(resolution, material_names, rng):
+    grid = np.linspace(0.0, 1.0, resolution, dtype=np.float32)
+    u, v = np.meshgrid(grid, grid)
+    size = rng.uniform(100.0, 2000.0)
+    height = np.sin(u * rng.uniform(1.0, 8.0)) * np.cos(v * rng.uniform(1.0, 8.0)) * size * 0.1
+
+    points = np.zeros(resolution * resolution, dtype=POINT_DTYPE)
+    points['co'] = np.column_stack((u.ravel() * size, v.ravel() * size, height.ravel()))
+
+    wedge_count = len(points)
+    wedge_dtype = WEDGE32_DTYPE if wedge_count > 65536 else WEDGE16_DTYPE
+    wedges = np.zeros(wedge_count, dtype=wedge_dtype)
+    wedges['point_index'] = np.arange(wedge_count)
+    wedges['u'] = u.ravel()
+    wedges['v'] = v.ravel()
+
+    rows, cols = np.meshgrid(np.arange(resolution - 1), np.arange(resolution - 1), indexing='ij')
+    corner = (rows * resolution + cols).ravel()
+    triangles = np.concatenate((
+        np.column_stack((corner, corner + resolution, corner + 1)),
+        np.column_stack((corner + 1, corner + resolution, corner + resolution + 1)),
+    ))
+    face_dtype = FACE32_DTYPE if wedge_count > 65536 else FACE16_DTYPE
+    faces = np.zeros(len(triangles), dtype=face_dtype)
+    faces['wedges'] = triangles
+    faces['material_index'] = np.arange(len(triangles)) * len(material_names) // len(triangles)
+    faces['smoothing_groups'] = np.where(np.tile(rows.ravel(), 2) < resolution // 2, 1, 2)
+
+    materials = np.zeros(len(material_names), dtype=MATERIAL_DTYPE)
+    materials['name'] = [name.encode('latin-1') for name in material_names]
+
+    lightmap_uvs = np.zeros(wedge_count, dtype=EXTRA_UV_DTYPE)
+    lightmap_uvs['uv'] = np.column_stack((wedges['u'], wedges['v'])) * 0.98 + 0.01
+
+    face_chunk_id = b'FACE3200' if face_dtype is FACE32_DTYPE else b'FACE0000'
+    return b''.join((
+        empty_chunk(b'ACTRHEAD', 0),
+        chunk(b'PNTS0000', points),
+        chunk(b'VTXW0000', wedges),
+        chunk(face_chunk_id, faces),
+        chunk(b'MATT0000', materials),
+        empty_chunk(b'REFSKELT', 120),
+        empty_chunk(b'RAWWEIGHTS', 12),
+        chunk(b'EXTRAUVS0', lightmap_uvs),
+    ))
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+# 8-bit RGB PNG written with zlib only, no imaging library needed
+def build_png(size, role, rng):
+    if role == 'Normal':
+        pixels = np.empty((size, size, 3), dtype=np.uint8)
+        pixels[...] = (128, 128, 255)
+    else:
+        gradient = np.linspace(0, 255, size, dtype=np.float32)
+        base = np.array([rng.randint(0, 255) for _ in range(3)], dtype=np.float32)
+        pixels = ((base + gradient[:, None, None] * 0.5 + gradient[None, :, None] * 0.5) % 256).astype(np.uint8)
+    # Every scanline starts with filter type 0
+    raw = np.concatenate((np.zeros((size, 1), dtype=np.uint8), pixels.reshape(size, size * 3)), axis=1)
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header)
+            + png_chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + png_chunk(b'IEND', b''))
+
+def write_file(path, contents):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(contents)
+
+def generate_depot(args):
+    rng = random.Random(args.seed)
+    np.random.seed(args.seed)
+    counts = {'pskx': 0, 'lod_pskx': 0, 'mat': 0, 'png': 0, 'shared_geometry': 0}
+    # Seeds of already written meshes, reused to produce identical geometry under another name
+    geometry_seeds = []
+
+    for package_index in range(args.packages):
+        package = f"Package{package_index:03d}"
+        for group_index in range(args.groups):
+            group_dir = os.path.join(args.output, package, f"Group{group_index:02d}")
+            if args.nesting > 1:
+                group_dir = os.path.join(group_dir, *[f"Sub{level}" for level in range(1, args.nesting)])
+
+            material_names = []
+            for material_index in range(args.materials):
+                material_name = f"M_{package}_{group_index:02d}_{material_index:02d}"
+                lines = []
+                for role in TEXTURE_ROLES:
+                    texture_name = f"T_{package}_{group_index:02d}_{material_index:02d}_{role[0]}"
+                    write_file(os.path.join(group_dir, 'Texture2D', texture_name + '.png'), build_png(args.texture_size, role, rng))
+                    counts['png'] += 1
+                    lines.append(f"{role}={texture_name}")
+                write_file(os.path.join(group_dir, 'Material3', material_name + '.mat'), ('\r\n'.join(lines) + '\r\n').encode('utf-8'))
+                counts['mat'] += 1
+                material_names.append(material_name)
+
+            for mesh_index in range(args.meshes):
+                mesh_name = f"SM_{package}_{group_index:02d}_{mesh_index:03d}"
+                if geometry_seeds and rng.random() < args.shared_fraction:
+                    geometry_seed, resolution, mesh_materials = rng.choice(geometry_seeds)
+                    counts['shared_geometry'] += 1
+                else:
+                    geometry_seed = rng.getrandbits(32)
+                    resolution = max(2, int(round(rng.uniform(args.min_vertices, args.max_vertices) ** 0.5)))
+                    mesh_materials = rng.sample(material_names, min(len(material_names), rng.randint(1, 2)))
+                    geometry_seeds.append((geometry_seed, resolution, mesh_materials))
+
+                mesh_dir = os.path.join(group_dir, 'StaticMesh3')
+                write_file(os.path.join(mesh_dir, mesh_name + '.pskx'), build_pskx(resolution, mesh_materials, random.Random(geometry_seed)))
+                counts['pskx'] += 1
+                for lod in range(1, args.lods + 1):
+                    lod_resolution = max(2, resolution >> lod)
+                    write_file(os.path.join(mesh_dir, f"{mesh_name}_LOD{lod}.pskx"),
+                               build_pskx(lod_resolution, mesh_materials, random.Random(geometry_seed)))
+                    counts['lod_pskx'] += 1
+
+        print(f"Generated {package} ({package_index + 1}/{args.packages})")
+    return counts
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic UModel style depot for benchmarking")
+    parser.add_argument('output', help="Folder to write the depot to")
+    parser.add_argument('--packages', type=int, default=10, help="Number of package folders")
+    parser.add_argument('--groups', type=int, default=4, help="Group folders per package")
+    parser.add_argument('--nesting', type=int, default=1, help="Folder depth of each group")
+    parser.add_argument('--meshes', type=int, default=25, help="PSKX files per group")
+    parser.add_argument('--lods', type=int, default=1, help="LOD variants written next to each PSKX file")
+    parser.add_argument('--min-vertices', type=int, default=200)
+    parser.add_argument('--max-vertices', type=int, default=5000)
+    parser.add_argument('--shared-fraction', type=float, default=0.2, help="Fraction of meshes that repeat an earlier mesh's geometry under a new name")
+    parser.add_argument('--materials', type=int, default=4, help=".mat files per group")
+    parser.add_argument('--texture-size', type=int, default=256, help="Width and height of the placeholder PNGs")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    counts = generate_depot(args)
+    print(f"Depot written to {args.output}: {counts['pskx']} meshes ({counts['shared_geometry']} with shared geometry), "
+          f"{counts['lod_pskx']} LOD files, {counts['mat']} materials, {counts['png']} textures")
+
+if __name__ == "__main__":
+    main()
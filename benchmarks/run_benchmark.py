@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# The parse pool spawns plain Python workers that run this script again as __mp_main__,
+# where Blender's modules cannot be imported. Only the Blender process imports them.
+if __name__ == "__main__":
+    import bpy
+    import addon_utils
+
+# Drives the addon's operators on a depot inside a background Blender and records
+# wall time, peak RSS and datablock counts per stage.
+# Usage:
+#   blender -b --factory-startup --python benchmarks/run_benchmark.py -- <depot> --output results.json [--baseline baseline.json]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PSK_ADDON = "io_import_scene_unreal_psa_psk_280"
+# Differences below this many seconds are noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.05
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is left out there
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def datablock_counts():
+    return {
+        'objects': len(bpy.data.objects),
+        'meshes': len(bpy.data.meshes),
+        'materials': len(bpy.data.materials),
+        'images': len(bpy.data.images),
+        'collections': len(bpy.data.collections),
+    }
+
+def run_stage(results, name, function):
+    print(f"Running stage {name}")
+    start = time.perf_counter()
+    outcome = function()
+    wall_seconds = time.perf_counter() - start
+    results['stages'][name] = {
+        'wall_seconds': wall_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'result': sorted(outcome) if isinstance(outcome, set) else outcome,
+        'counts': datablock_counts(),
+    }
+    print(f"Stage {name} took {wall_seconds:.2f}s")
+
+def load_addon():
+    addon_utils.enable(PSK_ADDON, default_set=True)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import medge_depot_builder
+    medge_depot_builder.register()
+
+def configure(props, args, cache_dir):
+    props.folder_path = args.depot
+    props.depot_path = args.depot
+    props.material_folder_path = args.depot
+    props.cache_path = cache_dir
+    props.worker_count = args.workers
+    props.deduplicate_meshes = args.deduplicate_meshes
+    props.use_texture_proxies = not args.full_resolution
+    props.prefab_match_mode = args.prefab_match_mode
+    props.process_all_collections = False
+    props.move_duplicates_to_level = False
+
+# Linked copies of GenericBrowser objects in a Level collection, named Foo.001 like hand placed duplicates
+def place_duplicates(count):
+    generic_browser = bpy.data.collections.get('GenericBrowser')
+    level = bpy.data.collections.get('Level')
+    if not level:
+        level = bpy.data.collections.new('Level')
+        bpy.context.scene.collection.children.link(level)
+    originals = [obj for obj in generic_browser.all_objects if obj.type == 'MESH']
+    for index, original in enumerate(originals):
+        for copy_index in range(count):
+            duplicate = original.copy()
+            duplicate.location = (index * 10.0, copy_index * 10.0, 0.0)
+            level.objects.link(duplicate)
+    return level
+
+def select_only(objects, active):
+    for obj in bpy.context.view_layer.objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    bpy.context.view_layer.objects.active = active
+
+# Parses a few depot files through the pool first. Workers that cannot start fall back to the main
+# thread without an error, the import timings would then measure the fallback instead of the pool.
+def check_parse_pool(depot, worker_count):
+    from medge_depot_builder.parse_pool import ParsePool
+    paths = []
+    for directory, directory_names, file_names in os.walk(depot):
+        paths += [os.path.join(directory, name) for name in file_names if name.endswith('.pskx')]
+        if paths:
+            break
+    with ParsePool(worker_count) as pool:
+        for parsed in pool.imap(paths[:pool.worker_count * 2]):
+            parsed.release()
+    return {'workers': pool.worker_count if pool.worker_count > 1 else 0, 'fallbacks': pool.fallback_count, 'broken': pool.broken}
+
+def run_benchmark(args):
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'blender': bpy.app.version_string,
+        'platform': platform.platform(),
+        'depot': os.path.abspath(args.depot),
+        'settings': {
+            'workers': args.workers,
+            'deduplicate_meshes': args.deduplicate_meshes,
+            'full_resolution': args.full_resolution,
+            'prefab_match_mode': args.prefab_match_mode,
+            'duplicates': args.duplicates,
+            'group_size': args.group_size,
+        },
+        'stages': {},
+    }
+
+    load_addon()
+    results['parse_pool'] = check_parse_pool(args.depot, args.workers)
+    if results['parse_pool']['fallbacks']:
+        raise RuntimeError(f"The parse pool failed and fell back to the main thread: {results['parse_pool']}")
+    props = bpy.context.scene.mass_import_props
+    cache_dir = args.cache or tempfile.mkdtemp(prefix="medge_benchmark_cache_")
+    configure(props, args, cache_dir)
+
+    run_stage(results, 'import_pskx', lambda: bpy.ops.object.mass_import_operator())
+    run_stage(results, 'reimport_unchanged', lambda: bpy.ops.object.mass_import_operator())
+    run_stage(results, 'import_materials', lambda: bpy.ops.material.import_mat_files())
+
+    level = place_duplicates(args.duplicates)
+    # Without MEdge Map Editor there is no medge_actor to set, only the matching is measured then
+    props.prefab_dry_run = not hasattr(bpy.types.Object, 'medge_actor')
+    results['settings']['prefab_dry_run'] = props.prefab_dry_run
+    run_stage(results, 'convert_prefabs', lambda: bpy.ops.object.convert_duplicates_to_prefabs())
+
+    members = list(level.objects)[:args.group_size]
+    if members:
+        select_only(members, members[0])
+        run_stage(results, 'group', lambda: bpy.ops.object.group_objects())
+
+        empty = bpy.context.view_layer.objects.active
+        def move_group():
+            empty.location.x += 100.0
+            bpy.context.view_layer.update()
+            return len(members)
+        run_stage(results, 'move_group', move_group)
+
+        select_only([empty], empty)
+        run_stage(results, 'ungroup', lambda: bpy.ops.object.ungroup_objects())
+
+    return results
+
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    print(f"{'Stage':<20} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+    for name, stage in results['stages'].items():
+        base_stage = baseline.get('stages', {}).get(name)
+        if not base_stage:
+            print(f"{name:<20} {'-':>10} {stage['wall_seconds']:>9.2f}s {'new':>8}")
+            continue
+        base_seconds = base_stage['wall_seconds']
+        current_seconds = stage['wall_seconds']
+        change = (current_seconds - base_seconds) / base_seconds if base_seconds > 0 else 0.0
+        flag = ""
+        if change > tolerance and current_seconds - base_seconds > NOISE_FLOOR_SECONDS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<20} {base_seconds:>9.2f}s {current_seconds:>9.2f}s {change:>+7.0%}{flag}")
+        if stage['counts'] != base_stage.get('counts'):
+            print(f"    counts differ: baseline {base_stage.get('counts')}, current {stage['counts']}")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the MEdge Depot Builder operators in background Blender")
+    parser.add_argument('depot', help="Depot folder, e.g. one written by generate_depot.py")
+    parser.add_argument('--output', default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument('--baseline', help="Earlier results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown per stage before it counts as a regression")
+    parser.add_argument('--cache', help="Cache folder to use, a fresh temporary folder by default")
+    parser.add_argument('--workers', type=int, default=0, help="Parse worker processes, 0 for automatic")
+    parser.add_argument('--deduplicate-meshes', action='store_true')
+    parser.add_argument('--full-resolution', action='store_true', help="Load full resolution textures instead of proxies")
+    parser.add_argument('--prefab-match-mode', choices=('NAME', 'GEOMETRY'), default='NAME')
+    parser.add_argument('--duplicates', type=int, default=2, help="Duplicates placed in Level per imported object")
+    parser.add_argument('--group-size', type=int, default=500, help="Number of Level objects grouped and ungrouped")
+    # Blender's own arguments come before the '--' separator
+    return parser.parse_args(argv[argv.index('--') + 1:] if '--' in argv else [])
+
+def main():
+    args = parse_args(sys.argv)
+    results = run_benchmark(args)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
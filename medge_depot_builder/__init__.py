@@ -4,13 +4,18 @@ bl_info = {
     "category": "Object",
 }
 
-import bpy
-from . import config, import_pskx, import_materials, convert_prefabs, grouping, ui_panel
+import importlib.util
+
+# PSKX parse workers import this package from plain Python processes that have no bpy
+if importlib.util.find_spec("bpy") is not None:
+    import bpy
+    from . import config, import_pskx, import_materials, selective_import, convert_prefabs, grouping, ui_panel
 
 def register():
     config.register()
     import_pskx.register()
     import_materials.register()
+    selective_import.register()
     convert_prefabs.register()
     grouping.register()
     ui_panel.register()
@@ -19,6 +24,7 @@ def unregister():
     ui_panel.unregister()
     grouping.unregister()
     convert_prefabs.unregister()
+    selective_import.unregister()
     import_materials.unregister()
     import_pskx.unregister()
     config.unregister()
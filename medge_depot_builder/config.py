@@ -1,7 +1,9 @@
 import bpy
-from bpy.props import StringProperty, BoolProperty
+import os
+from bpy.props import StringProperty, BoolProperty, IntProperty, EnumProperty, PointerProperty
 
 DEFAULT_DEPOT_PATH = r"D:\gamedev\medge_raw_depot"
+CACHE_FOLDER_NAME = ".medge_cache"
 
 class MassImportProperties(bpy.types.PropertyGroup):
     folder_path: StringProperty(
@@ -16,17 +18,109 @@ class MassImportProperties(bpy.types.PropertyGroup):
         default=DEFAULT_DEPOT_PATH,
         subtype='DIR_PATH'
     )
+    cache_path: StringProperty(
+        name="Cache Path",
+        description="Folder for texture indexes and other caches. Defaults to a .medge_cache folder inside the depot",
+        default="",
+        subtype='DIR_PATH'
+    )
     material_folder_path: StringProperty(
         name="Material Folder Path",
         description="Path to the folder containing .mat files",
         default="",
         subtype='DIR_PATH'
     )
+    use_texture_proxies: BoolProperty(
+        name="Use Texture Proxies",
+        description="Load downscaled copies of depot textures, cached in the cache folder. Full resolution can be loaded back per material",
+        default=True
+    )
+    proxy_size: IntProperty(
+        name="Proxy Size",
+        description="Largest width or height of a texture proxy in pixels",
+        default=512,
+        min=16,
+        max=8192
+    )
+    bake_texture_conversions: BoolProperty(
+        name="Bake Texture Conversions",
+        description="Flip the green channel of normal maps and invert specular maps once into the cache folder, so materials need no conversion nodes",
+        default=False
+    )
+    consolidate_materials: BoolProperty(
+        name="Consolidate Materials",
+        description="Build one material for .mat files that resolve to the same textures and point meshes using the others at it",
+        default=False
+    )
+    match_images_by_content: BoolProperty(
+        name="Match Images by Content",
+        description="Also reuse an already loaded image when another texture file has identical contents",
+        default=False
+    )
+    verbose_logging: BoolProperty(
+        name="Verbose Logging",
+        description="Print a console line for every imported file, material and converted object. Stage timings and counts are always written to the run report",
+        default=False
+    )
     skip_lod_files: BoolProperty(
         name="Skip LOD Files",
         description="Skip PSKX files with _lod postfix",
         default=True
     )
+    deduplicate_meshes: BoolProperty(
+        name="Share Identical Meshes",
+        description="Reuse one mesh datablock for PSKX files with identical positions, faces, UVs and materials",
+        default=False
+    )
+    worker_count: IntProperty(
+        name="Parse Workers",
+        description="Number of worker processes parsing PSKX files. 0 uses all cores but one, 1 parses on the main thread",
+        default=0,
+        min=0,
+        max=64
+    )
+    use_library_cache: BoolProperty(
+        name="Use Library Cache",
+        description="Build every package folder once into a cached .blend and load the packages from there instead of importing PSKX files",
+        default=False
+    )
+    library_link_mode: EnumProperty(
+        name="Library Mode",
+        description="How packages are loaded from the library cache",
+        items=[
+            ('LINK', "Link", "Link the package collections, the data stays read-only and is shared with other files"),
+            ('APPEND', "Append", "Append local copies of the package collections that can be edited"),
+        ],
+        default='LINK'
+    )
+    selective_source: EnumProperty(
+        name="Import For",
+        description="Which meshes Import Dependencies imports, together with the materials and textures they use",
+        items=[
+            ('LEVEL', "Level", "Meshes placed in the Level collection"),
+            ('SELECTED', "Selected", "Meshes of the selected objects"),
+            ('TEXT', "Text", "Mesh names listed one per line in a text block"),
+        ],
+        default='LEVEL'
+    )
+    mesh_list_text: PointerProperty(
+        name="Mesh List",
+        description="Text block with one mesh name per line",
+        type=bpy.types.Text
+    )
+    files_per_tick: IntProperty(
+        name="Files per Tick",
+        description="Number of PSKX files the interactive import handles between UI updates",
+        default=8,
+        min=1,
+        max=1000
+    )
+    redraw_interval: IntProperty(
+        name="Redraw Every",
+        description="Link new objects and redraw the viewport only after this many imported files during the interactive import",
+        default=200,
+        min=1
+    )
     process_all_collections: BoolProperty(
         name="Process All Collections",
         description="Process all collections including GenericBrowser",
@@ -37,6 +131,20 @@ class MassImportProperties(bpy.types.PropertyGroup):
         description="Move duplicates of objects to the Level collection",
         default=False
     )
+    prefab_match_mode: EnumProperty(
+        name="Match Duplicates By",
+        description="How Duplicates to Prefabs recognises copies of GenericBrowser objects",
+        items=[
+            ('NAME', "Name", "Objects named like a GenericBrowser object with a .001 style suffix"),
+            ('GEOMETRY', "Geometry", "Mesh objects with identical positions, faces, UVs and materials, whatever their name. Their mesh is replaced by the original's"),
+        ],
+        default='NAME'
+    )
+    prefab_dry_run: BoolProperty(
+        name="Dry Run",
+        description="Only list the duplicates Duplicates to Prefabs would convert and move, without changing anything",
+        default=False
+    )
     lock_compound: BoolProperty(
         name="Lock Compound",
         description="Parent objects in the same modular set to the _F object",
@@ -44,6 +152,25 @@ class MassImportProperties(bpy.types.PropertyGroup):
         update=lambda self, context: bpy.ops.object.organise_meshes()
     )
 
+# Operators that do not need the depot, like prefab conversion, still write their run report here.
+# A depot path that does not exist or a cache folder that cannot be created falls back to Blender's
+# temp folder instead of failing after the scene was already changed.
+def get_cache_dir(props):
+    depot_path = bpy.path.abspath(props.depot_path) if props.depot_path else ""
+    if props.cache_path:
+        cache_dir = bpy.path.abspath(props.cache_path)
+    elif os.path.isdir(depot_path):
+        cache_dir = os.path.join(depot_path, CACHE_FOLDER_NAME)
+    else:
+        cache_dir = os.path.join(bpy.app.tempdir, CACHE_FOLDER_NAME)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Could not create the cache folder {cache_dir}, using the temp folder instead: {e}")
+        cache_dir = os.path.join(bpy.app.tempdir, CACHE_FOLDER_NAME)
+        os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
 def register():
     bpy.utils.register_class(MassImportProperties)
     bpy.types.Scene.mass_import_props = bpy.props.PointerProperty(type=MassImportProperties)
@@ -2,44 +2,115 @@ import bpy
 import re
 from bpy.types import Operator
 from bpy.utils import register_class, unregister_class
+from .mesh_builder import mesh_geometry_fingerprint
+from .config import get_cache_dir
+from .instrumentation import RunStats
+
+BASE_NAME_PATTERN = re.compile(r"(.*)\.\d{3}")
 
 def get_base_name(name):
-    match = re.match(r"(.*)\.\d{3}", name)
+    match = BASE_NAME_PATTERN.match(name)
     return match.group(1) if match else name
 
-def get_all_objects(collection):
-    objects = set(collection.objects)
-    for child in collection.children:
-        objects.update(get_all_objects(child))
+# Walks each collection tree once, objects linked in several collections are only returned once
+def collect_unique_objects(collections):
+    objects = set()
+    visited = set()
+    stack = list(collections)
+    while stack:
+        collection = stack.pop()
+        if collection.name in visited:
+            continue
+        visited.add(collection.name)
+        objects.update(collection.objects)
+        stack.extend(collection.children)
     return objects
 
-def set_static_mesh_with_prefab(obj, prefab_name):
-    # Check if the object has the medge_actor property
-    if not hasattr(obj, 'medge_actor'):
-        print(f"Object '{obj.name}' does not have a medge_actor property")
-        return
-    
+# Groups duplicate objects by the GenericBrowser original their base name points to
+def group_duplicates_by_original(candidates, generic_object_dict):
+    groups = {}
+    for obj in candidates:
+        base_name = get_base_name(obj.name)
+        if base_name in generic_object_dict and obj.name != base_name:
+            groups.setdefault(base_name, []).append(obj)
+    return groups
+
+# Groups mesh objects by the GenericBrowser original with identical geometry, whatever their names.
+# Each mesh datablock is fingerprinted once, however many objects use it. The cache is keyed by the
+# mesh itself, a mesh linked from a library can have the same name as a local one.
+def group_duplicates_by_geometry(candidates, generic_objects):
+    fingerprints = {}
+
+    def get_fingerprint(mesh):
+        fingerprint = fingerprints.get(mesh)
+        if fingerprint is None:
+            fingerprint = fingerprints[mesh] = mesh_geometry_fingerprint(mesh)
+        return fingerprint
+
+    originals = {}
+    for obj in sorted(generic_objects, key=lambda obj: obj.name):
+        if obj.type == 'MESH':
+            originals.setdefault(get_fingerprint(obj.data), obj)
+
+    groups = {}
+    for obj in candidates:
+        # GenericBrowser objects are originals themselves, even when two of them share geometry
+        if obj.type != 'MESH' or obj in generic_objects:
+            continue
+        original = originals.get(get_fingerprint(obj.data))
+        if original:
+            groups.setdefault(original.name, []).append(obj)
+    return groups
+
+# Points the object at the original's mesh, dropping its own copy once nothing else uses it
+def relink_to_prefab_mesh(obj, prefab_obj):
+    old_mesh = obj.data
+    if old_mesh == prefab_obj.data:
+        return 0
+    freed = estimate_mesh_bytes(old_mesh)
+    obj.data = prefab_obj.data
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+        return freed
+    return 0
+
+def estimate_mesh_bytes(mesh):
+    loop_count = len(mesh.loops)
+    return (len(mesh.vertices) * 12 + len(mesh.edges) * 8 + len(mesh.polygons) * 8
+            + loop_count * (8 + 8 * len(mesh.uv_layers)))
+
+def set_static_mesh_with_prefab(obj, prefab_obj):
     # Set the medge_actor type to STATIC_MESH
     obj.medge_actor.type = 'STATIC_MESH'
     
     # Access the static_mesh property group
     static_mesh = obj.medge_actor.static_mesh
     
-    # Set the use_prefab property to True
+    # Set the use_prefab property to True and point it at the original
     static_mesh.use_prefab = True
-    
-    # Set the prefab property to the specified object
-    prefab_obj = bpy.data.objects.get(prefab_name)
-    if prefab_obj is None:
-        print(f"Prefab object '{prefab_name}' not found")
-        return
-    
     static_mesh.prefab = prefab_obj
     
     # Initialize the actor if needed
     static_mesh.init()
-    
-    print(f"Object '{obj.name}' has been set to STATIC_MESH with prefab '{prefab_name}'")
+
+def get_level_collection():
+    level_collection = bpy.data.collections.get("Level")
+    if not level_collection:
+        level_collection = bpy.data.collections.new("Level")
+        bpy.context.scene.collection.children.link(level_collection)
+    return level_collection
+
+def is_in_level_collection(obj, level_collection):
+    return any(col == level_collection or col.name.startswith("Level") for col in obj.users_collection)
+
+def move_to_level(obj, level_collection):
+    # Unlink the object from its current collections, except the Level collection
+    for col in obj.users_collection:
+        if col != level_collection:
+            col.objects.unlink(obj)
+    # Link the object to the Level collection if it's not already there
+    if obj.name not in level_collection.objects:
+        level_collection.objects.link(obj)
 
 class ConvertDuplicatesToPrefabs(Operator):
     bl_idname = "object.convert_duplicates_to_prefabs"
@@ -49,6 +120,9 @@ class ConvertDuplicatesToPrefabs(Operator):
     def execute(self, context):
         props = context.scene.mass_import_props
         process_all_collections = props.process_all_collections
+        move_duplicates_to_level = props.move_duplicates_to_level
+        dry_run = props.prefab_dry_run
+        stats = RunStats("convert_prefabs", props.verbose_logging)
 
         generic_browser = bpy.data.collections.get('GenericBrowser')
 
@@ -67,23 +141,58 @@ class ConvertDuplicatesToPrefabs(Operator):
                 self.report({'ERROR'}, "Level collection not found")
                 return {'CANCELLED'}
 
-        print(f"Collections to process: {[col.name for col in collections_to_process]}")
-
-        generic_objects = get_all_objects(generic_browser)
-        generic_object_dict = {obj.name: obj for obj in generic_objects}
-
-        for collection in collections_to_process:
-            level_objects = get_all_objects(collection)
-            for obj in level_objects:
-                base_name = get_base_name(obj.name)
-                if base_name in generic_object_dict and obj.name != base_name:
-                    original_obj = generic_object_dict[base_name]
+        if not dry_run and not hasattr(bpy.types.Object, 'medge_actor'):
+            self.report({'ERROR'}, "Objects have no medge_actor property, is MEdge Map Editor enabled?")
+            return {'CANCELLED'}
 
-                    # Set the static_mesh actor type and prefab properties
-                    set_static_mesh_with_prefab(obj, original_obj.name)
+        stats.log(f"Collections to process: {[col.name for col in collections_to_process]}")
 
-        self.report({'INFO'}, "Duplicate conversion to prefabs completed")
-        bpy.ops.object.move_prefabs_to_level()
+        match_geometry = props.prefab_match_mode == 'GEOMETRY'
+        with stats.stage('duplicate match'):
+            generic_objects = collect_unique_objects([generic_browser])
+            generic_object_dict = {obj.name: obj for obj in generic_objects}
+            candidates = collect_unique_objects(collections_to_process)
+            if match_geometry:
+                groups = group_duplicates_by_geometry(candidates, generic_objects)
+            else:
+                groups = group_duplicates_by_original(candidates, generic_object_dict)
+        stats.count('candidates', len(candidates))
+
+        if move_duplicates_to_level and not dry_run:
+            level_collection = get_level_collection()
+
+        # One pass over the grouped duplicates sets the prefab and moves the object to Level
+        converted_count = 0
+        moved_count = 0
+        freed_bytes = 0
+        with stats.stage('prefab convert'):
+            for base_name, duplicates in groups.items():
+                prefab_obj = generic_object_dict[base_name]
+                for obj in duplicates:
+                    move = move_duplicates_to_level and not (level_collection and is_in_level_collection(obj, level_collection))
+                    if dry_run:
+                        print(f"Would convert '{obj.name}' to STATIC_MESH with prefab '{prefab_obj.name}'" + (" and move it to Level" if move else ""))
+                    else:
+                        stats.log(f"Converting '{obj.name}' to STATIC_MESH with prefab '{prefab_obj.name}'")
+                        set_static_mesh_with_prefab(obj, prefab_obj)
+                        if match_geometry:
+                            freed_bytes += relink_to_prefab_mesh(obj, prefab_obj)
+                        if move:
+                            move_to_level(obj, level_collection)
+                    converted_count += 1
+                    moved_count += move
+        stats.count('duplicates', converted_count)
+        stats.count('moved to level', moved_count)
+        stats.count('freed mesh bytes', freed_bytes)
+        stats.write_report(get_cache_dir(props))
+
+        if dry_run:
+            self.report({'INFO'}, f"Dry run: {converted_count} duplicates would be converted, {moved_count} moved to Level. See the console")
+        else:
+            message = f"Duplicate conversion to prefabs completed: {converted_count} converted, {moved_count} moved to Level"
+            if match_geometry:
+                message += f", about {freed_bytes / (1024 * 1024):.1f} MB of duplicate meshes freed"
+            self.report({'INFO'}, message)
         return {'FINISHED'}
 
 class MovePrefabsToLevel(Operator):
@@ -96,25 +205,14 @@ class MovePrefabsToLevel(Operator):
         move_duplicates_to_level = props.move_duplicates_to_level
 
         # Ensure the Level collection exists
-        level_collection = bpy.data.collections.get("Level")
-        if not level_collection:
-            level_collection = bpy.data.collections.new("Level")
-            bpy.context.scene.collection.children.link(level_collection)
-
-        def is_in_level_collection(obj):
-            return any(col == level_collection or col.name.startswith("Level") for col in obj.users_collection)
+        level_collection = get_level_collection()
 
         if move_duplicates_to_level:
             for obj in bpy.data.objects:
-                if obj.name.startswith("PREFAB_") and not is_in_level_collection(obj):
-                    # Unlink the object from its current collections, except the Level collection
-                    for col in obj.users_collection:
-                        if col != level_collection:
-                            col.objects.unlink(obj)
-                    # Link the object to the Level collection if it's not already there
-                    if obj.name not in level_collection.objects:
-                        level_collection.objects.link(obj)
-                    print(f"Moved {obj.name} to Level collection")
+                if obj.name.startswith("PREFAB_") and not is_in_level_collection(obj, level_collection):
+                    move_to_level(obj, level_collection)
+                    if props.verbose_logging:
+                        print(f"Moved {obj.name} to Level collection")
 
         self.report({'INFO'}, "Moved prefabs to Level collection")
         return {'FINISHED'}
@@ -0,0 +1,138 @@
+import json
+import os
+from pathlib import PurePath
+from .pskx_reader import read_material_names, UnsupportedPskxError
+from .mat_pipeline import MatRecord, parse_mat_contents
+
+CATALOG_FILENAME = "depot_catalog.json"
+CATALOG_VERSION = 1
+
+# Which materials every PSKX file uses and which textures every .mat file uses, for the whole depot.
+# Entries are keyed by the path relative to the depot and only files whose size or mtime changed
+# are read again. The catalog is persisted to the cache folder next to the texture index.
+class DepotCatalog:
+    def __init__(self, depot_path, cache_dir):
+        self.depot_path = os.path.abspath(depot_path)
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.catalog_path = os.path.join(self.cache_dir, CATALOG_FILENAME)
+        self.meshes = {}
+        self.materials = {}
+        self.reread_files = 0
+
+    def load(self):
+        meshes, materials = {}, {}
+        if os.path.isfile(self.catalog_path):
+            try:
+                with open(self.catalog_path, 'r') as file:
+                    catalog = json.load(file)
+                if catalog.get('version') == CATALOG_VERSION and catalog.get('depot_path') == self.depot_path:
+                    meshes = catalog['meshes']
+                    materials = catalog['materials']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Discarding unreadable depot catalog {self.catalog_path}: {e}")
+
+        self.refresh(meshes, materials)
+        if self.reread_files or len(meshes) != len(self.meshes) or len(materials) != len(self.materials):
+            self.save()
+        return self
+
+    def save(self):
+        catalog = {
+            'version': CATALOG_VERSION,
+            'depot_path': self.depot_path,
+            'meshes': self.meshes,
+            'materials': self.materials,
+        }
+        temp_path = self.catalog_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(catalog, file)
+        os.replace(temp_path, self.catalog_path)
+
+    # Walks the depot in the same sorted, depth first order as the mesh import,
+    # so the first file found for a name is the one a full import would keep
+    def refresh(self, previous_meshes, previous_materials):
+        self.meshes = {}
+        self.materials = {}
+        self.reread_files = 0
+        if os.path.isdir(self.depot_path):
+            self.scan_directory(self.depot_path, previous_meshes, previous_materials)
+
+    def scan_directory(self, directory, previous_meshes, previous_materials):
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError as e:
+            print(f"Could not list {directory}: {e}")
+            return
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                if os.path.abspath(path) != self.cache_dir:
+                    self.scan_directory(path, previous_meshes, previous_materials)
+            elif name.endswith('.pskx'):
+                self.add_entry(self.meshes, previous_meshes, path, self.read_mesh_entry)
+            elif name.endswith('.mat'):
+                self.add_entry(self.materials, previous_materials, path, self.read_material_entry)
+
+    def add_entry(self, entries, previous_entries, path, read_entry):
+        relative_path = PurePath(os.path.relpath(path, self.depot_path)).as_posix()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        entry = previous_entries.get(relative_path)
+        if not entry or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+            entry = read_entry(path)
+            entry['size'] = stat.st_size
+            entry['mtime'] = stat.st_mtime
+            self.reread_files += 1
+        entries[relative_path] = entry
+
+    def read_mesh_entry(self, path):
+        try:
+            return {'materials': read_material_names(path)}
+        except (OSError, UnsupportedPskxError) as e:
+            print(f"Could not read the materials of {path}: {e}")
+            return {'materials': []}
+
+    def read_material_entry(self, path):
+        record = MatRecord(path)
+        try:
+            with open(path, 'rb') as file:
+                parse_mat_contents(record, file.read())
+        except OSError as e:
+            print(f"Could not read {path}: {e}")
+        return {'textures': record.textures}
+
+    # Relative paths by file name without extension, the first one in depot order wins
+    @staticmethod
+    def paths_by_name(entries):
+        paths = {}
+        for relative_path in entries:
+            paths.setdefault(PurePath(relative_path).stem, relative_path)
+        return paths
+
+    # Meshes, materials and texture names needed by the given mesh names.
+    # Returns relative mesh paths, relative .mat paths, texture names and the names found nowhere.
+    def closure(self, mesh_names):
+        mesh_paths = self.paths_by_name(self.meshes)
+        material_paths = self.paths_by_name(self.materials)
+
+        meshes, materials, textures, missing = [], [], set(), []
+        seen_materials = set()
+        for mesh_name in sorted(set(mesh_names)):
+            mesh_path = mesh_paths.get(mesh_name)
+            if not mesh_path:
+                missing.append(mesh_name)
+                continue
+            meshes.append(mesh_path)
+            for material_name in self.meshes[mesh_path]['materials']:
+                material_path = material_paths.get(material_name)
+                if not material_path or material_path in seen_materials:
+                    continue
+                seen_materials.add(material_path)
+                materials.append(material_path)
+                textures.update(self.materials[material_path]['textures'].values())
+        # Imported in depot order, like a full import would
+        mesh_order = {path: index for index, path in enumerate(self.meshes)}
+        meshes.sort(key=mesh_order.get)
+        return meshes, materials, sorted(textures), missing
@@ -0,0 +1,17 @@
+import hashlib
+import numpy as np
+
+FINGERPRINT_DIGEST_SIZE = 16
+
+# Hashes array contents together with their dtypes and shapes, so equal bytes laid out
+# differently never collide. Names such as material slots are mixed in after the arrays.
+def fingerprint_arrays(arrays, names=()):
+    digest = hashlib.blake2b(digest_size=FINGERPRINT_DIGEST_SIZE)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(array.dtype.str.encode())
+        digest.update(np.asarray(array.shape, dtype=np.int64).tobytes())
+        digest.update(memoryview(array).cast('B'))
+    for name in names:
+        digest.update(name.encode('utf-8') + b'\0')
+    return digest.hexdigest()
@@ -1,7 +1,133 @@
 import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from mathutils import Matrix
 from bpy.types import Operator
 from bpy.utils import register_class, unregister_class
 
+GROUP_PREFIX = "TGROUP_"
+
+# Members are parented to the TGROUP empty and keep their offset from it as their local
+# transform, so moving a group is a single parent evaluation instead of three constraint
+# solves per member. Groups made by older versions still use COPY_* constraints.
+GROUP_CONSTRAINT_TYPES = {'COPY_LOCATION', 'COPY_ROTATION', 'COPY_SCALE'}
+# Members that had a parent of their own remember it here, Ungroup parents them back
+PREVIOUS_PARENT_PROP = "medge_group_parent"
+PREVIOUS_PARENT_BONE_PROP = "medge_group_parent_bone"
+
+# Reverse index of group membership: TGROUP empty pointer -> {member pointer: member}, and member
+# pointer -> empty pointer. Keyed by as_pointer() so renaming an object keeps its entries. Built once
+# per file and kept current by Group, Ungroup and the depsgraph handler, so finding the members of a
+# group never has to scan every object and constraint. Undo and file loads rebuild it, and so does a
+# lookup that finds an entry which no longer matches the object's actual group.
+group_members = {}
+member_groups = {}
+group_index_valid = False
+last_selection = None
+
+def is_group_constraint(constraint):
+    target = getattr(constraint, 'target', None)
+    return constraint.type in GROUP_CONSTRAINT_TYPES and target is not None and target.name.startswith(GROUP_PREFIX)
+
+def get_group_target(obj):
+    if obj.parent and obj.parent.name.startswith(GROUP_PREFIX):
+        return obj.parent
+    for constraint in obj.constraints:
+        if is_group_constraint(constraint):
+            return constraint.target
+    return None
+
+def matrices_to_array(matrices):
+    return np.array([np.array(matrix) for matrix in matrices], dtype=np.float64).reshape(-1, 4, 4)
+
+def store_previous_parent(obj):
+    if obj.parent and not obj.parent.name.startswith(GROUP_PREFIX):
+        obj[PREVIOUS_PARENT_PROP] = obj.parent
+        if obj.parent_type == 'BONE':
+            obj[PREVIOUS_PARENT_BONE_PROP] = obj.parent_bone
+    obj.parent_type = 'OBJECT'
+
+def restore_previous_parent(obj):
+    previous_parent = obj.get(PREVIOUS_PARENT_PROP)
+    parent_bone = obj.get(PREVIOUS_PARENT_BONE_PROP)
+    for prop in (PREVIOUS_PARENT_PROP, PREVIOUS_PARENT_BONE_PROP):
+        if prop in obj:
+            del obj[prop]
+    # Deleting the parent while the object was grouped clears the pointer
+    if not isinstance(previous_parent, bpy.types.Object):
+        obj.parent = None
+        return
+    obj.parent = previous_parent
+    if parent_bone and previous_parent.type == 'ARMATURE' and parent_bone in previous_parent.data.bones:
+        obj.parent_type = 'BONE'
+        obj.parent_bone = parent_bone
+
+# Bakes the current world matrix of every member and detaches it from its group, back to the parent
+# it had before grouping if any. Legacy constraint members are read from the evaluated depsgraph
+# so the constraint result is kept.
+def release_members(objects, depsgraph):
+    worlds = matrices_to_array(obj.evaluated_get(depsgraph).matrix_world for obj in objects)
+    for obj, world in zip(objects, worlds):
+        for constraint in [constraint for constraint in obj.constraints if is_group_constraint(constraint)]:
+            obj.constraints.remove(constraint)
+        if obj.parent and obj.parent.name.startswith(GROUP_PREFIX):
+            restore_previous_parent(obj)
+        obj.matrix_parent_inverse = Matrix.Identity(4)
+        # Setting the world matrix accounts for a restored parent, whose own world matrix is unchanged
+        obj.matrix_world = Matrix(world.tolist())
+        index_member(obj)
+
+def index_member(obj):
+    key = obj.as_pointer()
+    previous_group = member_groups.pop(key, None)
+    if previous_group:
+        group_members.get(previous_group, {}).pop(key, None)
+    target = get_group_target(obj)
+    if target:
+        member_groups[key] = target.as_pointer()
+        group_members.setdefault(target.as_pointer(), {})[key] = obj
+
+def forget_group(empty):
+    empty_key = empty.as_pointer()
+    for member_key in group_members.pop(empty_key, {}):
+        if member_groups.get(member_key) == empty_key:
+            del member_groups[member_key]
+
+def is_member_of(obj, empty):
+    try:
+        return get_group_target(obj) == empty
+    except ReferenceError:
+        # The object was deleted since it was indexed
+        return False
+
+def ensure_group_index():
+    global group_index_valid
+    if group_index_valid:
+        return
+    group_members.clear()
+    member_groups.clear()
+    for obj in bpy.data.objects:
+        if obj.parent or obj.constraints:
+            index_member(obj)
+    group_index_valid = True
+
+def get_group_member_objects(empty):
+    global group_index_valid
+    ensure_group_index()
+    members = list(group_members.get(empty.as_pointer(), {}).values())
+    if all(is_member_of(obj, empty) for obj in members):
+        return members
+    # A stale entry means the index missed a change, e.g. a deleted object whose pointer was reused
+    group_index_valid = False
+    ensure_group_index()
+    return list(group_members.get(empty.as_pointer(), {}).values())
+
+@persistent
+def invalidate_group_index(dummy):
+    global group_index_valid, last_selection
+    group_index_valid = False
+    last_selection = None
+
 class GroupObjects(Operator):
     bl_idname = "object.group_objects"
     bl_label = "Group Objects"
@@ -15,25 +141,36 @@ class GroupObjects(Operator):
             self.report({'ERROR'}, "No objects selected or no active object")
             return {'CANCELLED'}
 
-        # Create the empty axis object
-        empty_name = f"TGROUP_{active_object.name}_001"
+        ensure_group_index()
+        depsgraph = context.evaluated_depsgraph_get()
+
+        # Children of other selected objects move with their parent and are left alone
+        selected_names = {obj.name for obj in selected_objects}
+        members = [obj for obj in selected_objects if not (obj.parent and obj.parent.name in selected_names)]
+
+        # Members of a legacy constraint group are baked first so their constraints do not fight the parent
+        legacy_members = [obj for obj in members if any(is_group_constraint(constraint) for constraint in obj.constraints)]
+        if legacy_members:
+            release_members(legacy_members, depsgraph)
+
+        # Create the empty axis object at the active object's transform
+        root_world = np.array(active_object.matrix_world, dtype=np.float64)
+        empty_name = f"{GROUP_PREFIX}{active_object.name}_001"
         empty = bpy.data.objects.new(empty_name, None)
         context.collection.objects.link(empty)
-        empty.location = active_object.location
-        empty.rotation_euler = active_object.rotation_euler
-        empty.scale = active_object.scale
-
-        # Add constraints to selected objects
-        for obj in selected_objects:
-            if obj != empty:
-                loc_constraint = obj.constraints.new(type='COPY_LOCATION')
-                loc_constraint.target = empty
+        empty.matrix_world = Matrix(root_world.tolist())
 
-                rot_constraint = obj.constraints.new(type='COPY_ROTATION')
-                rot_constraint.target = empty
+        # Offsets relative to the group root for all members in one batched product
+        worlds = matrices_to_array(obj.evaluated_get(depsgraph).matrix_world for obj in members)
+        offsets = np.matmul(np.linalg.inv(root_world), worlds)
 
-                scale_constraint = obj.constraints.new(type='COPY_SCALE')
-                scale_constraint.target = empty
+        identity = Matrix.Identity(4)
+        for obj, offset in zip(members, offsets):
+            store_previous_parent(obj)
+            obj.parent = empty
+            obj.matrix_parent_inverse = identity
+            obj.matrix_basis = Matrix(offset.tolist())
+            index_member(obj)
 
         # Set the selection to the new empty object
         bpy.ops.object.select_all(action='DESELECT')
@@ -43,7 +180,7 @@ class GroupObjects(Operator):
         # Re-attach the handler
         ensure_handler()
 
-        self.report({'INFO'}, f"Grouped {len(selected_objects)} objects with {empty.name}")
+        self.report({'INFO'}, f"Grouped {len(members)} objects with {empty.name}")
         return {'FINISHED'}
 
 class UngroupObjects(Operator):
@@ -52,82 +189,62 @@ class UngroupObjects(Operator):
     bl_description = "Ungroup selected objects and remove the empty axis object"
 
     def execute(self, context):
-        selected_objects = context.selected_objects
+        ensure_group_index()
         empties_to_remove = set()
-        objects_to_apply = set()
 
-        for obj in selected_objects:
-            if obj.name.startswith("TGROUP_"):
+        for obj in context.selected_objects:
+            if obj.name.startswith(GROUP_PREFIX):
                 empties_to_remove.add(obj)
-                for constrained_obj in self.get_constrained_objects(obj):
-                    objects_to_apply.add(constrained_obj)
             else:
-                objects_to_apply.add(obj)
-                if obj.constraints:
-                    for constraint in obj.constraints:
-                        if constraint.target and constraint.target.name.startswith("TGROUP_"):
-                            empties_to_remove.add(constraint.target)
-                            for constrained_obj in self.get_constrained_objects(constraint.target):
-                                objects_to_apply.add(constrained_obj)
+                target = get_group_target(obj)
+                if target:
+                    empties_to_remove.add(target)
 
-        for obj in objects_to_apply:
-            self.apply_constraints(obj)
+        members = []
+        for empty in empties_to_remove:
+            members.extend(get_group_member_objects(empty))
+        if members:
+            release_members(members, context.evaluated_depsgraph_get())
 
         for empty in empties_to_remove:
+            forget_group(empty)
             bpy.data.objects.remove(empty)
 
         # Re-attach the handler
         ensure_handler()
 
-        self.report({'INFO'}, "Ungrouped selected objects")
+        self.report({'INFO'}, f"Ungrouped {len(members)} objects from {len(empties_to_remove)} groups")
         return {'FINISHED'}
 
-    def get_constrained_objects(self, empty):
-        constrained_objects = []
-        for obj in bpy.data.objects:
-            for constraint in obj.constraints:
-                if constraint.target == empty:
-                    constrained_objects.append(obj)
-                    break
-        return constrained_objects
-
-    def apply_constraints(self, obj):
-        if obj.constraints:
-            for constraint in obj.constraints:
-                if constraint.type == 'COPY_LOCATION':
-                    obj.location = constraint.target.location
-                elif constraint.type == 'COPY_ROTATION':
-                    obj.rotation_euler = constraint.target.rotation_euler
-                elif constraint.type == 'COPY_SCALE':
-                    obj.scale = constraint.target.scale
-            self.remove_constraints(obj)
-
-    def remove_constraints(self, obj):
-        for constraint in obj.constraints:
-            obj.constraints.remove(constraint)
+def redirect_selection_handler(scene, depsgraph=None):
+    global last_selection
+    ensure_group_index()
+
+    # Constraint edits show up as object updates, only those objects are re-indexed
+    if depsgraph is not None:
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                index_member(update.id.original)
 
-def redirect_selection_handler(scene):
     selected_objects = bpy.context.selected_objects
+    active_object = bpy.context.view_layer.objects.active
+    selection = (active_object.as_pointer() if active_object else None, len(selected_objects))
+    if selection == last_selection:
+        return
+    last_selection = selection
+
     if len(selected_objects) == 1:
-        selected_obj = selected_objects[0]
-        for constraint in selected_obj.constraints:
-            if constraint.target and constraint.target.name.startswith("TGROUP_"):
-                bpy.context.view_layer.objects.active = constraint.target
-                bpy.ops.object.select_all(action='DESELECT')
-                constraint.target.select_set(True)
-                constrained_objects = get_constrained_objects(constraint.target)
-                for obj in constrained_objects:
-                    obj.select_set(True)
-                return
-
-def get_constrained_objects(empty):
-    constrained_objects = []
-    for obj in bpy.data.objects:
-        for constraint in obj.constraints:
-            if constraint.target == empty:
-                constrained_objects.append(obj)
-                break
-    return constrained_objects
+        # Read from the object itself, the index only serves the member lookup
+        empty = get_group_target(selected_objects[0])
+        if empty:
+            bpy.context.view_layer.objects.active = empty
+            bpy.ops.object.select_all(action='DESELECT')
+            empty.select_set(True)
+            members = get_group_member_objects(empty)
+            for obj in members:
+                obj.select_set(True)
+            # The redirect itself triggers another update, which must not count as a new selection
+            last_selection = (empty.as_pointer(), len(members) + 1)
 
 def ensure_handler():
     if redirect_selection_handler not in bpy.app.handlers.depsgraph_update_post:
@@ -137,12 +254,19 @@ def register():
     register_class(GroupObjects)
     register_class(UngroupObjects)
     ensure_handler()
+    # Loading a file and undo or redo replace the objects, and with them their pointers
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if invalidate_group_index not in handlers:
+            handlers.append(invalidate_group_index)
 
 def unregister():
     unregister_class(GroupObjects)
     unregister_class(UngroupObjects)
     if redirect_selection_handler in bpy.app.handlers.depsgraph_update_post:
         bpy.app.handlers.depsgraph_update_post.remove(redirect_selection_handler)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if invalidate_group_index in handlers:
+            handlers.remove(invalidate_group_index)
 
 if __name__ == "__main__":
     register()
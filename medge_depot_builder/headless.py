@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import PurePosixPath
+
+PSK_ADDON = "io_import_scene_unreal_psa_psk_280"
+
+# Spawned parse workers run this script again as __mp_main__ in plain Python, where bpy cannot be
+# imported. Only the Blender process imports Blender and the addon modules.
+if __name__ == "__main__":
+    import bpy
+    import addon_utils
+
+    # Run as a script by Blender there is no parent package, make the addon importable by its folder
+    # name and enable the PSK import script it falls back to before anything imports it
+    if not __package__:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        __package__ = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+        addon_utils.enable(PSK_ADDON, default_set=False)
+
+    from .config import get_cache_dir
+    from .import_pskx import DepotImportJob
+    from .import_materials import create_materials, find_mat_files, is_material_current
+    from .mat_pipeline import parse_mat_files, unique_texture_paths
+    from .texture_resolver import TextureResolver
+    from .texture_proxies import ensure_proxy, needs_proxy
+    from .image_registry import ImageRegistry
+    from .mesh_builder import collect_fingerprinted_meshes, FINGERPRINT_PROP
+    from .instrumentation import RunStats
+
+# Command line build of a depot .blend, split over several background Blender processes.
+#
+#   blender -b --factory-startup --python medge_depot_builder/headless.py -- build <depot> --output depot.blend --shards 16
+#
+# The master process scans the depot exactly like the Import PSKX Files operator, so the collection
+# tree, skipped LODs and duplicate names come out the same. The queued files are split into shards,
+# each shard is imported by its own Blender into a .blend, and the shards are appended back into the
+# master in the original order. Materials are then built in the master from the same .mat files,
+# with the texture proxies already generated by the shards. An existing output file is updated
+# incrementally through its import manifest.
+
+SHARD_FOLDER_SUFFIX = "_shards"
+
+# Starts from the factory scene without reloading it, which would also reset the enabled addons
+def clear_startup_data():
+    for datablocks in (bpy.data.objects, bpy.data.collections, bpy.data.meshes, bpy.data.materials, bpy.data.cameras, bpy.data.lights):
+        for datablock in list(datablocks):
+            datablocks.remove(datablock)
+
+# Splits the queued files into contiguous runs of roughly equal size on disk
+def split_into_shards(pending_files, shard_count):
+    sizes = [os.path.getsize(file_path) for file_path, collection_path, manifest_key in pending_files]
+    target = sum(sizes) / max(1, shard_count)
+    shards = [[]]
+    shard_size = 0
+    for (file_path, collection_path, manifest_key), size in zip(pending_files, sizes):
+        if shard_size >= target and len(shards) < shard_count:
+            shards.append([])
+            shard_size = 0
+        shards[-1].append(manifest_key)
+        shard_size += size
+    return [shard for shard in shards if shard]
+
+# The .mat files of the materials folder and of the --material-list file, without duplicates
+def collect_mat_files(args, material_dir):
+    mat_files = find_mat_files(material_dir) if os.path.isdir(material_dir) else []
+    if args.material_list:
+        with open(args.material_list, 'r') as file:
+            mat_files += [os.path.abspath(line.strip()) for line in file if line.strip()]
+    return list(dict.fromkeys(mat_files))
+
+# Proxies of the textures the master is about to load, spread round robin over the shards
+def collect_missing_proxies(mat_files, resolver, cache_dir, proxy_size):
+    records = parse_mat_files(mat_files, resolver)
+    records = [record for record in records if record.content_hash and not is_material_current(record)]
+    return [path for path in unique_texture_paths(records) if needs_proxy(path, cache_dir, proxy_size)]
+
+def shard_command(args, shard_dir, index):
+    command = [
+        bpy.app.binary_path, '-b', '--factory-startup', '--python', os.path.abspath(__file__), '--',
+        'shard', args.depot_path,
+        '--work', os.path.join(shard_dir, f"shard_{index:03d}.json"),
+        '--output', os.path.join(shard_dir, f"shard_{index:03d}.blend"),
+        '--cache', args.cache_path,
+        '--proxy-size', str(args.proxy_size),
+        '--workers', str(args.workers),
+    ]
+    if args.deduplicate_meshes:
+        command.append('--deduplicate-meshes')
+    return command
+
+def run_shards(args, work_items, shard_dir, stats):
+    processes = []
+    for index, work in enumerate(work_items):
+        with open(os.path.join(shard_dir, f"shard_{index:03d}.json"), 'w') as file:
+            json.dump(work, file)
+        log = open(os.path.join(shard_dir, f"shard_{index:03d}.log"), 'w')
+        processes.append((index, subprocess.Popen(shard_command(args, shard_dir, index), stdout=log, stderr=subprocess.STDOUT), log))
+
+    failed = []
+    for index, process, log in processes:
+        return_code = process.wait()
+        log.close()
+        if return_code != 0:
+            failed.append(index)
+            print(f"Shard {index} failed with exit code {return_code}, see {log.name}")
+    stats.count('shards', len(work_items))
+    return failed
+
+def append_shard(job, shard_blend, shard_manifest_path, shared_meshes):
+    with open(shard_manifest_path, 'r') as file:
+        entries = json.load(file)
+    object_names = [name for entry in entries.values() for name in entry['objects']]
+
+    with bpy.data.libraries.load(shard_blend, link=False) as (data_from, data_to):
+        data_to.objects = object_names
+        data_to.materials = list(data_from.materials)
+    material_names = list(data_from.materials)
+
+    # Shards only hold placeholder materials, a name the master already has points to the master's material
+    for name, material in zip(material_names, data_to.materials):
+        existing = bpy.data.materials.get(name)
+        if material and existing and existing != material:
+            material.user_remap(existing)
+            bpy.data.materials.remove(material)
+
+    appended = dict(zip(object_names, data_to.objects))
+    for manifest_key, entry in entries.items():
+        objects = [appended[name] for name in entry['objects'] if appended.get(name)]
+        collection_path = PurePosixPath(manifest_key).parent.parts
+        for obj in objects:
+            if shared_meshes is not None and obj.type == 'MESH' and FINGERPRINT_PROP in obj.data:
+                mesh = shared_meshes.setdefault(obj.data[FINGERPRINT_PROP], obj.data)
+                if mesh != obj.data:
+                    old_mesh = obj.data
+                    obj.data = mesh
+                    if old_mesh.users == 0:
+                        bpy.data.meshes.remove(old_mesh)
+            job.index.link(obj, collection_path)
+        job.manifest.record(manifest_key, os.path.join(job.depot_path, manifest_key), objects, entry['hash'])
+        job.imported_count += 1
+    return len(entries)
+
+def build(args):
+    args.depot_path = os.path.abspath(args.depot_path)
+    args.cache_path = os.path.abspath(args.cache_path) if args.cache_path else ""
+    args.cache_path = get_cache_dir(args)
+    output = os.path.abspath(args.output)
+    folder = os.path.abspath(args.folder or args.depot_path)
+    material_dir = os.path.abspath(args.materials or folder)
+    mat_files = collect_mat_files(args, material_dir)
+    stats = RunStats("headless_build", args.verbose)
+
+    # A fresh build ignores the existing output, its manifest would keep meshes, proxies and images
+    # that were made with other options
+    if os.path.isfile(output) and not args.fresh:
+        bpy.ops.wm.open_mainfile(filepath=output)
+    else:
+        clear_startup_data()
+
+    job = DepotImportJob(folder, args.depot_path, not args.include_lods, args.workers, args.deduplicate_meshes, stats, args.cache_path)
+    job.scan()
+
+    if args.shards <= 1:
+        # One process is exactly the operator's import
+        job.import_queued()
+    else:
+        with stats.stage('proxy plan'):
+            resolver = TextureResolver(args.depot_path, args.cache_path).load()
+            # Baked textures get their own proxies once they exist, only plain source textures are prepared here
+            textures = []
+            if not args.full_resolution and not args.bake_textures:
+                textures = collect_missing_proxies(mat_files, resolver, args.cache_path, args.proxy_size)
+        shards = split_into_shards(job.pending_files, args.shards)
+        shard_count = max(len(shards), min(args.shards, len(textures)))
+        work_items = [{'files': shards[index] if index < len(shards) else [], 'textures': textures[index::shard_count]}
+                      for index in range(shard_count)]
+
+        shard_dir = output + SHARD_FOLDER_SUFFIX
+        os.makedirs(shard_dir, exist_ok=True)
+        with stats.stage('shards'):
+            failed = run_shards(args, work_items, shard_dir, stats) if work_items else []
+        if failed:
+            print(f"{len(failed)} of {len(work_items)} shards failed, {output} was not written")
+            return 1
+
+        with stats.stage('merge'):
+            for file_path, collection_path, manifest_key in job.pending_files:
+                job.remove_previous_import(manifest_key)
+            # Collected after the removals, which may delete meshes of changed files
+            shared_meshes = collect_fingerprinted_meshes() if args.deduplicate_meshes else None
+            for index, work in enumerate(work_items):
+                if work['files']:
+                    append_shard(job, os.path.join(shard_dir, f"shard_{index:03d}.blend"),
+                                 os.path.join(shard_dir, f"shard_{index:03d}_manifest.json"), shared_meshes)
+            job.manifest.save()
+        stats.count('imported files', job.imported_count)
+        if not args.keep_shards:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+    if mat_files:
+        with stats.stage('texture index'):
+            resolver = TextureResolver(args.depot_path, args.cache_path).load()
+        registry = ImageRegistry(False, None if args.full_resolution else args.cache_path, args.proxy_size)
+        create_materials(mat_files, resolver, registry, stats, args.cache_path if args.bake_textures else None, args.consolidate_materials)
+
+    with stats.stage('save'):
+        bpy.ops.wm.save_as_mainfile(filepath=output)
+    stats.write_report(args.cache_path)
+    print(f"Wrote {output}. {job.summary()}")
+    return 0
+
+# Imports one shard's files into an empty file and generates its share of the texture proxies
+def shard(args):
+    with open(args.work, 'r') as file:
+        work = json.load(file)
+    clear_startup_data()
+
+    for texture_path in work['textures']:
+        ensure_proxy(texture_path, args.cache, args.proxy_size)
+
+    if work['files']:
+        job = DepotImportJob(args.depot_path, args.depot_path, True, args.workers, args.deduplicate_meshes)
+        job.queue_files(work['files'])
+        job.import_queued()
+        with open(os.path.splitext(args.output)[0] + "_manifest.json", 'w') as file:
+            json.dump(job.manifest.entries, file)
+        bpy.ops.wm.save_as_mainfile(filepath=args.output, compress=False)
+        print(f"Shard written to {args.output}. {job.summary()}")
+    return 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="headless.py", description="Build a MEdge depot .blend from the command line")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="Import a depot into a .blend, split over several Blender processes")
+    build_parser.add_argument('depot_path', help="Folder UModel extracted the packages to")
+    build_parser.add_argument('--output', required=True, help=".blend file to write. An existing file is updated with new and changed files only")
+    build_parser.add_argument('--folder', help="Folder to import *.pskx files from, the whole depot by default")
+    build_parser.add_argument('--materials', help="Folder to import *.mat files from, the import folder by default")
+    build_parser.add_argument('--cache', dest='cache_path', help="Cache folder, a .medge_cache folder inside the depot by default")
+    build_parser.add_argument('--shards', type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Number of Blender processes to import with")
+    build_parser.add_argument('--workers', type=int, default=1, help="Parse worker processes per shard")
+    build_parser.add_argument('--include-lods', action='store_true', help="Also import *.pskx files with _lod in their name")
+    build_parser.add_argument('--deduplicate-meshes', action='store_true', help="Share one mesh between files with identical geometry")
+    build_parser.add_argument('--full-resolution', action='store_true', help="Load full resolution textures instead of proxies")
+    build_parser.add_argument('--proxy-size', type=int, default=512)
+    build_parser.add_argument('--bake-textures', action='store_true', help="Convert specular and normal maps once on disk instead of with shader nodes")
+    build_parser.add_argument('--consolidate-materials', action='store_true', help="Build one material for .mat files that resolve to the same textures")
+    build_parser.add_argument('--material-list', help="Text file with further .mat files to build, one path per line")
+    build_parser.add_argument('--fresh', action='store_true', help="Build a new file instead of updating an existing output")
+    build_parser.add_argument('--keep-shards', action='store_true', help="Keep the shard .blend files and logs next to the output")
+    build_parser.add_argument('--verbose', action='store_true', help="Print a line per imported file")
+
+    shard_parser = commands.add_parser('shard', help="Internal: import one shard of a build")
+    shard_parser.add_argument('depot_path')
+    shard_parser.add_argument('--work', required=True)
+    shard_parser.add_argument('--output', required=True)
+    shard_parser.add_argument('--cache', required=True)
+    shard_parser.add_argument('--proxy-size', type=int, default=512)
+    shard_parser.add_argument('--workers', type=int, default=1)
+    shard_parser.add_argument('--deduplicate-meshes', action='store_true')
+
+    # Blender's own arguments come before the '--' separator
+    return parser.parse_args(argv[argv.index('--') + 1:] if '--' in argv else [])
+
+def main(argv):
+    args = parse_args(argv)
+    if args.command == 'build':
+        return build(args)
+    return shard(args)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,101 @@
+import bpy
+import os
+from .import_manifest import hash_file
+from .texture_proxies import ensure_proxy, is_proxy, SOURCE_PATH_PROP
+
+CONTENT_HASH_PROP = "medge_content_hash"
+SOURCE_MTIME_PROP = "medge_source_mtime"
+
+def normalize_image_path(path):
+    return os.path.normcase(os.path.abspath(bpy.path.abspath(path)))
+
+# Keeps every file image loaded through the addon keyed by its normalized absolute path,
+# and optionally by a hash of the file contents, so the same texture is never loaded twice.
+# With a proxy folder set, images load a cached downscaled copy but stay keyed by their source.
+# An image whose source file changed since it was loaded is reloaded, from a new proxy if it used one.
+class ImageRegistry:
+    def __init__(self, use_content_hash=False, proxy_cache_dir=None, proxy_size=512):
+        self.use_content_hash = use_content_hash
+        self.proxy_cache_dir = proxy_cache_dir
+        self.proxy_size = proxy_size
+        self.by_path = {}
+        self.by_hash = {}
+        for image in bpy.data.images:
+            if image.source != 'FILE' or not image.filepath:
+                continue
+            self.by_path.setdefault(normalize_image_path(image.get(SOURCE_PATH_PROP, image.filepath)), image)
+            if CONTENT_HASH_PROP in image:
+                self.by_hash.setdefault(image[CONTENT_HASH_PROP], image)
+
+    def get(self, image_path):
+        key = normalize_image_path(image_path)
+        image = self.by_path.get(key)
+        if image:
+            return self.refresh(image, image_path)
+
+        content_hash = None
+        if self.use_content_hash:
+            content_hash = hash_file(image_path)
+            image = self.by_hash.get(content_hash)
+            if image:
+                self.by_path[key] = image
+                return image
+
+        load_path = image_path
+        if self.proxy_cache_dir:
+            load_path = ensure_proxy(image_path, self.proxy_cache_dir, self.proxy_size)
+        image = bpy.data.images.load(load_path, check_existing=True)
+        image[SOURCE_PATH_PROP] = image_path
+        image[SOURCE_MTIME_PROP] = os.path.getmtime(image_path)
+        self.by_path[key] = image
+        if content_hash:
+            image[CONTENT_HASH_PROP] = content_hash
+            self.by_hash[content_hash] = image
+        return image
+
+    # Images swapped to full resolution stay at full resolution, proxies get the proxy of the new source
+    def refresh(self, image, image_path):
+        try:
+            mtime = os.path.getmtime(image_path)
+        except OSError:
+            return image
+        if image.get(SOURCE_MTIME_PROP) == mtime:
+            return image
+        load_path = image_path
+        if self.proxy_cache_dir and is_proxy(image):
+            load_path = ensure_proxy(image_path, self.proxy_cache_dir, self.proxy_size)
+        image.filepath = load_path
+        image.reload()
+        image[SOURCE_PATH_PROP] = image_path
+        image[SOURCE_MTIME_PROP] = mtime
+        if CONTENT_HASH_PROP in image:
+            # The stored hash belongs to the old contents
+            self.by_hash.pop(image[CONTENT_HASH_PROP], None)
+            del image[CONTENT_HASH_PROP]
+        return image
+
+    def images(self):
+        return {image for image in self.by_path.values()}
+
+    # One row per image: name, path, width, height, bytes held in memory, number of users
+    def memory_report(self):
+        rows = []
+        for image in self.images():
+            if image.has_data:
+                width, height = image.size
+                bytes_per_channel = 4 if image.is_float else 1
+                memory = width * height * image.channels * bytes_per_channel
+            else:
+                width = height = memory = 0
+            rows.append((image.name, image.filepath, width, height, memory, image.users))
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows
+
+    def print_memory_report(self):
+        rows = self.memory_report()
+        total = sum(row[4] for row in rows)
+        print(f"{len(rows)} images, {total / (1024 * 1024):.1f} MB loaded")
+        for name, filepath, width, height, memory, users in rows:
+            size = f"{width}x{height}" if memory else "not loaded"
+            print(f"    {name}: {size}, {memory / (1024 * 1024):.2f} MB, {users} users, {filepath}")
+        return total
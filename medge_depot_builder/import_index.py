@@ -0,0 +1,61 @@
+import bpy
+
+# Custom property holding the depot folder a collection stands for.
+# Collection names are global in Blender, so two folders with the same name end up
+# as "Mesh" and "Mesh.001" and the name alone no longer identifies the folder.
+DEPOT_FOLDER_PROP = "medge_depot_folder"
+
+# In-memory index of the GenericBrowser tree, built once per import run.
+# Collections are keyed by their full depot folder path and objects by name,
+# so lookups and placement are constant time and never mix up same-named folders.
+class ImportIndex:
+    def __init__(self, root_name="GenericBrowser"):
+        root = bpy.data.collections.get(root_name)
+        if not root:
+            root = bpy.data.collections.new(root_name)
+            bpy.context.scene.collection.children.link(root)
+        self.root = root
+        self.collections = {}
+        self.objects = {}
+
+        stack = [((), root)]
+        while stack:
+            parts, collection = stack.pop()
+            # Keep the first collection seen for a path if the tree already holds duplicates
+            if parts in self.collections:
+                continue
+            self.collections[parts] = collection
+            for obj in collection.objects:
+                self.objects[obj.name] = obj
+            for child in collection.children:
+                stack.append((parts + (child.get(DEPOT_FOLDER_PROP, child.name),), child))
+
+    def get_collection(self, parts):
+        parts = tuple(parts)
+        collection = self.collections.get(parts)
+        if collection:
+            return collection
+        parent = self.get_collection(parts[:-1])
+        collection = bpy.data.collections.new(parts[-1])
+        collection[DEPOT_FOLDER_PROP] = parts[-1]
+        parent.children.link(collection)
+        self.collections[parts] = collection
+        return collection
+
+    def contains(self, object_name):
+        return object_name in self.objects
+
+    def get_object(self, object_name):
+        return self.objects.get(object_name)
+
+    def link(self, obj, parts):
+        collection = self.get_collection(parts)
+        if obj.name not in collection.objects:
+            while obj.users_collection:
+                obj.users_collection[0].objects.unlink(obj)
+            collection.objects.link(obj)
+        self.objects[obj.name] = obj
+
+    def forget(self, object_names):
+        for name in object_names:
+            self.objects.pop(name, None)
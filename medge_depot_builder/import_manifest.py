@@ -0,0 +1,87 @@
+import bpy
+import hashlib
+import json
+import os
+from .pskx_reader import HASH_DIGEST_SIZE
+
+MANIFEST_TEXT_NAME = "medge_import_manifest.json"
+MANIFEST_VERSION = 1
+
+# Same digest as PskxData.content_hash, for files that were not parsed natively
+def hash_file(file_path):
+    digest = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Record of every imported PSKX file, kept in a text datablock so it is saved with the .blend.
+# Entries are keyed by the file path relative to the depot and hold the file state and the
+# names of the objects and meshes the file produced.
+class ImportManifest:
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls):
+        text = bpy.data.texts.get(MANIFEST_TEXT_NAME)
+        if not text:
+            return cls()
+        try:
+            manifest = json.loads(text.as_string())
+        except ValueError as e:
+            print(f"Discarding unreadable import manifest: {e}")
+            return cls()
+        if manifest.get('version') != MANIFEST_VERSION:
+            return cls()
+        return cls(manifest.get('files', {}))
+
+    def save(self):
+        text = bpy.data.texts.get(MANIFEST_TEXT_NAME)
+        if not text:
+            text = bpy.data.texts.new(MANIFEST_TEXT_NAME)
+        text.from_string(json.dumps({'version': MANIFEST_VERSION, 'files': self.entries}, indent=1))
+
+    # Returns 'new', 'missing', 'changed' or 'unchanged'
+    def file_status(self, relative_path, file_path):
+        entry = self.entries.get(relative_path)
+        if not entry:
+            return 'new'
+        if not entry['objects'] or any(name not in bpy.data.objects for name in entry['objects']):
+            return 'missing'
+
+        stat = os.stat(file_path)
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return 'unchanged'
+        # Only read the file when size or mtime moved, a touched but identical file is not reimported
+        if entry['hash'] and stat.st_size == entry['size'] and hash_file(file_path) == entry['hash']:
+            entry['mtime'] = stat.st_mtime
+            return 'unchanged'
+        return 'changed'
+
+    # Objects adopted from before the manifest existed are recorded without a hash,
+    # it is filled in on the next import if the file ever changes
+    def record(self, relative_path, file_path, objects, content_hash=None):
+        stat = os.stat(file_path)
+        self.entries[relative_path] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash,
+            'objects': [obj.name for obj in objects],
+            'meshes': [obj.data.name for obj in objects if obj.type == 'MESH'],
+        }
+
+    # Returns the names of the removed objects
+    def remove_imported_data(self, relative_path):
+        entry = self.entries.pop(relative_path, None)
+        if not entry:
+            return []
+        for name in entry['objects']:
+            obj = bpy.data.objects.get(name)
+            if obj:
+                bpy.data.objects.remove(obj)
+        for name in entry['meshes']:
+            mesh = bpy.data.meshes.get(name)
+            if mesh and mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+        return entry['objects']
@@ -1,17 +1,24 @@
 import bpy
+import hashlib
 import os
 from bpy.types import Operator
 from bpy.utils import register_class, unregister_class
-from .config import MassImportProperties
+from .config import MassImportProperties, get_cache_dir
+from .texture_resolver import TextureResolver
+from .node_groups import new_group_node, SPECULAR_GROUP_NAME, NORMAL_GROUP_NAME
+from .mat_pipeline import parse_mat_files, unique_texture_paths, consolidate_records
+from .image_registry import ImageRegistry
+from .texture_proxies import get_material_images, load_full_resolution
+from .node_layout import layout_node_trees, capture_layout, restore_layout
+from .instrumentation import RunStats
+from .texture_bake import bake_record_textures
+from .material_remap import update_material_remap, apply_material_remap
 
-def create_materials_from_mat_files(directory_path, search_path):
-    print(f"Checking directory path: {directory_path}")
-    print(f"Checking search path: {search_path}")
-    
-    if not os.path.exists(directory_path):
-        print(f"Directory does not exist: {directory_path}")
-        return
+MAT_HASH_PROP = "medge_mat_hash"
+# Bump when the generated node graph changes so existing materials get rebuilt
+MATERIAL_BUILD_VERSION = 1
 
+def find_mat_files(directory_path):
     material_files = []
 
     stack = [directory_path]
@@ -23,67 +30,105 @@ def create_materials_from_mat_files(directory_path, search_path):
                 material_files.append(filename)
             elif os.path.isdir(filename):
                 stack.append(filename)
-    for mat_file in material_files:
-        create_or_update_material_from_mat_file(mat_file, search_path)
-        
-    remove_duplicate_images()
-
-def create_or_update_material_from_mat_file(mat_file_path, search_path):
-    directory, mat_filename = os.path.split(mat_file_path)
-    material_name = os.path.splitext(mat_filename)[0]
-
-    texture_paths = {}
-    with open(mat_file_path, 'r') as file:
-        for line in file:
-            if '=' in line:
-                key, value = line.strip().split('=')
-                texture_paths[key.strip()] = value.strip()
-
-    if material_name in bpy.data.materials:
-        material = bpy.data.materials[material_name]
-        material.use_nodes = True
-        nodes = material.node_tree.nodes
-    else:
-        material = bpy.data.materials.new(name=material_name)
-        material.use_nodes = True
-        nodes = material.node_tree.nodes
+    return material_files
+
+# Parsing and texture resolution run concurrently up front, bpy only loads each
+# unique image once and wires the materials from the finished records
+def create_materials_from_mat_files(directory_path, resolver, registry, stats, bake_dir=None, consolidate=False):
+    stats.log(f"Checking directory path: {directory_path}")
+    stats.log(f"Checking search path: {resolver.depot_path}")
+    
+    if not os.path.exists(directory_path):
+        print(f"Directory does not exist: {directory_path}")
+        return 0, 0, []
+
+    with stats.stage('scan'):
+        mat_files = find_mat_files(directory_path)
+    return create_materials(mat_files, resolver, registry, stats, bake_dir, consolidate)
+
+# Builds the materials of the given .mat files, returns the built and unchanged counts and the parse errors.
+# With a bake folder, specular and normal maps are converted once into that folder instead of by shader nodes.
+# With consolidate, .mat files resolving to the same textures share the material of the first one.
+def create_materials(mat_files, resolver, registry, stats, bake_dir=None, consolidate=False):
+    baked = bake_dir is not None
+    with stats.stage('texture resolve'):
+        records = parse_mat_files(mat_files, resolver)
+    errors = [(record.path, error) for record in records for error in record.errors]
+
+    remap = {}
+    if consolidate:
+        with stats.stage('consolidate'):
+            records, remap = consolidate_records(records)
+    material_remap = update_material_remap(remap, [record.name for record in records])
+    stats.count('materials consolidated', len(remap))
+
+    records_to_build = [record for record in records if record.content_hash and not is_material_current(record, baked)]
+    # Hashed before baking swaps the resolved paths for the baked copies
+    build_hashes = {record.path: material_hash(record, baked) for record in records_to_build}
+    if baked:
+        with stats.stage('texture bake'):
+            bake_record_textures(records_to_build, bake_dir, stats)
+
+    image_count = len(bpy.data.images)
+    with stats.stage('image load'):
+        images = {image_path: registry.get(image_path) for image_path in unique_texture_paths(records_to_build)}
+    stats.count('images used', len(images))
+    stats.count('images loaded', len(bpy.data.images) - image_count)
+    with stats.stage('node build'):
+        materials = [build_material(record, images, stats, baked, build_hashes[record.path]) for record in records_to_build]
+    with stats.stage('node layout'):
+        layout_node_trees([material.node_tree for material in materials])
+    # Placeholders made by earlier mesh imports and previously built duplicates give way to the kept material
+    stats.count('materials merged', apply_material_remap({name: material_remap[name] for name in remap}))
+
+    stats.count('materials built', len(records_to_build))
+    stats.count('materials unchanged', len(records) - len(records_to_build))
+    stats.count('mat errors', len(errors))
+    return len(records_to_build), len(records) - len(records_to_build), errors
+
+# Switching texture baking on or off rebuilds the material, the node graphs differ.
+# The resolved texture paths are part of the hash, so a texture that turns up later or
+# resolves to another file rebuilds the material too.
+def material_hash(record, baked=False):
+    digest = hashlib.blake2b(record.content_hash.encode(), digest_size=16)
+    digest.update(str(MATERIAL_BUILD_VERSION).encode())
+    if baked:
+        digest.update(b"baked")
+    for key in sorted(record.textures):
+        path = record.resolved.get(key)
+        digest.update(f"{key}={os.path.normcase(os.path.abspath(path)) if path else ''}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def is_material_current(record, baked=False):
+    material = bpy.data.materials.get(record.name)
+    return material is not None and material.get(MAT_HASH_PROP) == material_hash(record, baked)
 
-    bsdf_node = None
-    output_node = None
+def build_material(record, images, stats, baked=False, build_hash=None):
+    material = bpy.data.materials.get(record.name)
+    if not material:
+        material = bpy.data.materials.new(name=record.name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    # Changed materials are rebuilt in place rather than getting another set of nodes
+    previous_layout = capture_layout(material.node_tree)
+    nodes.clear()
 
-    for node in nodes:
-        if node.type == 'BSDF_PRINCIPLED':
-            bsdf_node = node
-        elif node.type == 'OUTPUT_MATERIAL':
-            output_node = node
+    bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
+    bsdf_node.location = (300, 300)
 
-    if not bsdf_node:
-        bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
-        bsdf_node.location = (300, 300)
+    output_node = nodes.new(type='ShaderNodeOutputMaterial')
+    output_node.location = (500, 300)
 
-    if not output_node:
-        output_node = nodes.new(type='ShaderNodeOutputMaterial')
-        output_node.location = (500, 300)
+    missing_keys = []
 
     def load_and_link_texture(texture_key, node_location, input_socket, color_space='sRGB'):
-        if texture_key in texture_paths:
-            texture_image_path = os.path.join(directory, texture_paths[texture_key] + '.png')
-            image_name = os.path.basename(texture_image_path)
-            image = bpy.data.images.get(image_name)
+        if texture_key in record.textures:
+            image = images.get(record.resolved.get(texture_key))
             if not image:
-                if os.path.isfile(texture_image_path):
-                    image = bpy.data.images.load(texture_image_path)
-                else:
-                    matches = []
-                    for root, dirnames, filenames in os.walk(search_path):
-                        for f in filenames:
-                            if f == texture_paths[texture_key] + '.png':
-                                matches.append(os.path.join(root, f))
-                    if matches:
-                        image = bpy.data.images.load(matches[0])
-                    else:
-                        print(f"Texture file not found for key: {texture_key}")
-                        return None
+                stats.log(f"Texture file not found for key: {texture_key}")
+                stats.count('missing textures')
+                missing_keys.append(texture_key)
+                return None
             image.colorspace_settings.name = color_space
 
             texture_image_node = nodes.new('ShaderNodeTexImage')
@@ -97,74 +142,35 @@ def create_or_update_material_from_mat_file(mat_file_path, search_path):
     load_and_link_texture('Diffuse', (100, 400), bsdf_node.inputs['Base Color'])
 
     specular_node = load_and_link_texture('Specular', (100, 200), None, 'Non-Color')
-    if specular_node:
-        invert_node = nodes.new('ShaderNodeInvert')
-        invert_node.location = (300, 200)
-        material.node_tree.links.new(invert_node.inputs['Color'], specular_node.outputs['Color'])
-        material.node_tree.links.new(bsdf_node.inputs['Roughness'], invert_node.outputs['Color'])
+    if specular_node and 'Specular' in record.baked:
+        material.node_tree.links.new(bsdf_node.inputs['Roughness'], specular_node.outputs['Color'])
+    elif specular_node:
+        specular_group_node = new_group_node(nodes, SPECULAR_GROUP_NAME, (300, 200))
+        material.node_tree.links.new(specular_group_node.inputs['Specular'], specular_node.outputs['Color'])
+        material.node_tree.links.new(bsdf_node.inputs['Roughness'], specular_group_node.outputs['Roughness'])
 
     normal_map_node = load_and_link_texture('Normal', (100, 0), None, 'Non-Color')
-    if normal_map_node:
-        separate_rgb_node = nodes.new('ShaderNodeSeparateRGB')
-        separate_rgb_node.location = (200, 0)
-        material.node_tree.links.new(separate_rgb_node.inputs['Image'], normal_map_node.outputs['Color'])
-
-        invert_green_node = nodes.new('ShaderNodeInvert')
-        invert_green_node.location = (400, 0)
-        material.node_tree.links.new(invert_green_node.inputs['Color'], separate_rgb_node.outputs['G'])
-
-        combine_rgb_node = nodes.new('ShaderNodeCombineRGB')
-        combine_rgb_node.location = (600, 0)
-        material.node_tree.links.new(combine_rgb_node.inputs['R'], separate_rgb_node.outputs['R'])
-        material.node_tree.links.new(combine_rgb_node.inputs['G'], invert_green_node.outputs['Color'])
-        material.node_tree.links.new(combine_rgb_node.inputs['B'], separate_rgb_node.outputs['B'])
-
-        normal_map_convert_node = nodes.new('ShaderNodeNormalMap')
-        normal_map_convert_node.location = (800, 0)
-        material.node_tree.links.new(normal_map_convert_node.inputs['Color'], combine_rgb_node.outputs['Image'])
-        material.node_tree.links.new(bsdf_node.inputs['Normal'], normal_map_convert_node.outputs['Normal'])
+    if normal_map_node and 'Normal' in record.baked:
+        normal_node = nodes.new('ShaderNodeNormalMap')
+        normal_node.location = (300, 0)
+        material.node_tree.links.new(normal_node.inputs['Color'], normal_map_node.outputs['Color'])
+        material.node_tree.links.new(bsdf_node.inputs['Normal'], normal_node.outputs['Normal'])
+    elif normal_map_node:
+        normal_group_node = new_group_node(nodes, NORMAL_GROUP_NAME, (300, 0))
+        material.node_tree.links.new(normal_group_node.inputs['Color'], normal_map_node.outputs['Color'])
+        material.node_tree.links.new(bsdf_node.inputs['Normal'], normal_group_node.outputs['Normal'])
 
     material.node_tree.links.new(output_node.inputs['Surface'], bsdf_node.outputs['BSDF'])
-    organize_nodes(material.node_tree)
+    if restore_layout(material.node_tree, previous_layout):
+        stats.count('layouts kept')
+    # A material missing a texture is not stamped, the next import tries again
+    if missing_keys:
+        if MAT_HASH_PROP in material:
+            del material[MAT_HASH_PROP]
+    else:
+        material[MAT_HASH_PROP] = build_hash or material_hash(record, baked)
     return material
 
-def organize_nodes(node_tree):
-    def get_node_depth(node, visited=None):
-        if visited is None:
-            visited = set()
-        if node in visited:
-            return 0
-        visited.add(node)
-        if not node.inputs or all(not link.is_linked for link in node.inputs):
-            return 0
-        return 1 + max(get_node_depth(link.from_node, visited) for input in node.inputs if input.is_linked for link in input.links)
-
-    nodes_by_depth = {}
-    for node in node_tree.nodes:
-        depth = get_node_depth(node)
-        if depth not in nodes_by_depth:
-            nodes_by_depth[depth] = []
-        nodes_by_depth[depth].append(node)
-
-    for depth, nodes in nodes_by_depth.items():
-        y = 0
-        for node in nodes:
-            node.location.x = depth * 300
-            node.location.y = y
-            y -= 300
-
-    for depth, nodes in nodes_by_depth.items():
-        for node in nodes:
-            connected_y_positions = [link.from_node.location.y for input in node.inputs if input.is_linked for link in input.links]
-            if connected_y_positions:
-                node.location.y = sum(connected_y_positions) / len(connected_y_positions)
-
-def remove_duplicate_images():
-    image_names = {img.name for img in bpy.data.images}
-    for img in bpy.data.images:
-        if any(img.name.startswith(name) and img.name != name for name in image_names):
-            bpy.data.images.remove(img)
-
 class MATERIAL_OT_Import(Operator):
     bl_idname = "material.import_mat_files"
     bl_label = "Import Materials"
@@ -173,15 +179,80 @@ class MATERIAL_OT_Import(Operator):
     def execute(self, context):
         props = context.scene.mass_import_props
         directory = props.material_folder_path
-        search_path = props.depot_path
-        create_materials_from_mat_files(directory, search_path)
-        remove_duplicate_images()
+        cache_dir = get_cache_dir(props)
+        stats = RunStats("import_materials", props.verbose_logging)
+        with stats.stage('texture index'):
+            resolver = TextureResolver(props.depot_path, cache_dir).load()
+        stats.count('rescanned directories', resolver.rescanned_directories)
+        registry = ImageRegistry(props.match_images_by_content, cache_dir if props.use_texture_proxies else None, props.proxy_size)
+        bake_dir = cache_dir if props.bake_texture_conversions else None
+        built_count, skipped_count, errors = create_materials_from_mat_files(directory, resolver, registry, stats, bake_dir, props.consolidate_materials)
+        self.report({'INFO'}, f"Built {built_count} materials, {skipped_count} were unchanged")
+
+        for path, error in errors:
+            print(f"Error in {path}: {error}")
+        if errors:
+            self.report({'WARNING'}, f"{len(errors)} problems found in .mat files, see the console")
+
+        ambiguous_count = resolver.report_ambiguous()
+        stats.count('ambiguous textures', ambiguous_count)
+        stats.write_report(cache_dir)
+        if ambiguous_count:
+            self.report({'WARNING'}, f"{ambiguous_count} texture names matched several depot files, see the console")
+        return {'FINISHED'}
+
+class MATERIAL_OT_ImageReport(Operator):
+    bl_idname = "material.image_memory_report"
+    bl_label = "Image Memory Report"
+    bl_description = "Print the memory use and user count of every file image to the console"
+
+    def execute(self, context):
+        registry = ImageRegistry()
+        total = registry.print_memory_report()
+        self.report({'INFO'}, f"{len(registry.images())} images use {total / (1024 * 1024):.1f} MB, see the console")
+        return {'FINISHED'}
+
+class MATERIAL_OT_LoadFullResolution(Operator):
+    bl_idname = "material.load_full_resolution_textures"
+    bl_label = "Load Full Resolution Textures"
+    bl_description = "Swap texture proxies back to their full resolution depot files"
+
+    scope: bpy.props.EnumProperty(
+        name="Scope",
+        items=[
+            ('SELECTED', "Selected Objects", "Materials of the selected objects"),
+            ('SCENE', "Whole Scene", "Every material in the file"),
+        ],
+        default='SELECTED'
+    )
+
+    def execute(self, context):
+        props = context.scene.mass_import_props
+        stats = RunStats("load_full_resolution", props.verbose_logging)
+        if self.scope == 'SELECTED':
+            materials = {slot.material for obj in context.selected_objects for slot in obj.material_slots}
+        else:
+            materials = set(bpy.data.materials)
+
+        swapped_count = 0
+        with stats.stage('image load'):
+            for image in get_material_images(materials):
+                if load_full_resolution(image):
+                    stats.log(f"Loaded {image.filepath} at full resolution")
+                    swapped_count += 1
+        stats.count('textures swapped', swapped_count)
+        stats.write_report(get_cache_dir(props))
+        self.report({'INFO'}, f"Loaded {swapped_count} textures at full resolution")
         return {'FINISHED'}
 
 def register():
     register_class(MATERIAL_OT_Import)
+    register_class(MATERIAL_OT_ImageReport)
+    register_class(MATERIAL_OT_LoadFullResolution)
 
 def unregister():
+    unregister_class(MATERIAL_OT_LoadFullResolution)
+    unregister_class(MATERIAL_OT_ImageReport)
     unregister_class(MATERIAL_OT_Import)
 
 if __name__ == "__main__":
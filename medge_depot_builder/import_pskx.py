@@ -1,126 +1,377 @@
 import bpy
 import os
+import time
 from pathlib import Path
 from bpy.types import Operator
 from bpy.utils import register_class, unregister_class
 from io_import_scene_unreal_psa_psk_280 import pskimport
-from .config import MassImportProperties
+from .config import MassImportProperties, get_cache_dir
+from .instrumentation import RunStats
+from .library_cache import import_from_library_cache
+from .parse_pool import ParsePool
+from .import_manifest import ImportManifest, hash_file
+from .import_index import ImportIndex
+from .mesh_builder import MeshArrays, build_mesh, collect_fingerprinted_meshes, finalize_imported_objects, mark_sharp_edges_by_angle, FINGERPRINT_PROP
+from .material_remap import load_material_remap, remap_mesh_materials
 
-class MassImportOperator(Operator):
-    bl_idname = "object.mass_import_operator"
-    bl_label = "Import PSKX Files"
+POST_PROCESS_BATCH_SIZE = 64
 
-    def ensure_collection_exists(self, collection_name, parent_collection):
-        collection = bpy.data.collections.get(collection_name)
-        if not collection:
-            collection = bpy.data.collections.new(collection_name)
-            parent_collection.children.link(collection)
-        return collection
+# State of one mass import run: folder scan, parse pool, batched post-processing and manifest.
+# The blocking and the modal import operators drive the same job.
+class DepotImportJob:
+    def __init__(self, folder_path, depot_path, skip_lod_files=True, worker_count=0, deduplicate_meshes=False, stats=None, cache_dir=None):
+        self.folder_path = Path(folder_path)
+        self.depot_path = Path(depot_path)
+        # The cache folder defaults to a folder inside the depot, it is not part of the collection tree
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.skip_lod_files = skip_lod_files
+        self.worker_count = worker_count
+        self.stats = stats or RunStats("mass_import")
 
-    def object_exists_in_collection(self, object_name, collection):
-        for obj in collection.objects:
-            if obj.name == object_name:
-                return True
-        for sub_collection in collection.children:
-            if self.object_exists_in_collection(object_name, sub_collection):
-                return True
-        return False
+        with self.stats.stage('index'):
+            self.index = ImportIndex("GenericBrowser")
+            # The manifest is saved even if the run stops halfway, so the next run picks up from there
+            self.manifest = ImportManifest.load()
+            self.shared_meshes = collect_fingerprinted_meshes() if deduplicate_meshes else None
+            self.material_remap = load_material_remap()
+        self.pending_files = []
+        self.queued_names = set()
+        self.imported_batch = []
+        self.imported_count = 0
+        self.unchanged_count = 0
+        self.processed_count = 0
+        self.shared_mesh_count = 0
+        self.shared_mesh_bytes = 0
+        self.pool = None
+        self.parsed_files = None
+
+    @classmethod
+    def from_props(cls, props):
+        return cls(props.folder_path, props.depot_path, props.skip_lod_files, props.worker_count, props.deduplicate_meshes,
+                   RunStats("mass_import", props.verbose_logging), get_cache_dir(props))
+
+    @property
+    def total(self):
+        return len(self.pending_files)
 
-    def process_folder(self, current_path, current_collection, depot_path, skip_lod_files):
-        for item in os.listdir(current_path):
+    def scan(self):
+        with self.stats.stage('scan'):
+            self.process_folder(self.folder_path, self.depot_path, self.skip_lod_files)
+        self.stats.count('queued files', self.total)
+        return self.total
+
+    def process_folder(self, current_path, depot_path, skip_lod_files):
+        for item in sorted(os.listdir(current_path)):
             item_path = os.path.join(current_path, item)
             if os.path.isdir(item_path):
+                if os.path.abspath(item_path) == self.cache_dir:
+                    continue
                 relative_path = os.path.relpath(item_path, depot_path)
-                sub_collection = self.ensure_nested_collections(relative_path, "GenericBrowser")
-                self.process_folder(item_path, sub_collection, depot_path, skip_lod_files)
+                self.index.get_collection(Path(relative_path).parts)
+                self.process_folder(item_path, depot_path, skip_lod_files)
             elif item.endswith('.pskx'):
                 if skip_lod_files and '_lod' in item.lower():
+                    self.stats.count('skipped lod files')
                     continue
-                relative_path = os.path.relpath(item_path, depot_path)
-                collection_path = Path("GenericBrowser") / Path(relative_path).parent
-                object_name = Path(item).stem
-                if not self.object_exists_in_collection(object_name, bpy.data.collections.get("GenericBrowser")):
-                    self.import_pskx(item_path, collection_path)
-                else:
-                    print(f"Skipping {item} as it already exists in GenericBrowser collection")
-
-    def ensure_nested_collections(self, relative_path, root_collection_name):
-        parent_collection = bpy.data.collections.get(root_collection_name)
-        if not parent_collection:
-            parent_collection = bpy.data.collections.new(root_collection_name)
-            bpy.context.scene.collection.children.link(parent_collection)
-        
-        for part in Path(relative_path).parts:
-            parent_collection = self.ensure_collection_exists(part, parent_collection)
-        
-        return parent_collection
-
-    def import_pskx(self, file_path, collection_path):
-        print(f"Importing: {file_path} into collection {collection_path}")
+                self.queue_file(item_path, os.path.relpath(item_path, depot_path))
+
+    # Queues a file unless the manifest says it is up to date or another file already imports its name
+    def queue_file(self, item_path, relative_path):
+        collection_path = Path(relative_path).parent.parts
+        manifest_key = Path(relative_path).as_posix()
+        object_name = Path(item_path).stem
+
+        status = self.manifest.file_status(manifest_key, item_path)
+        if status == 'unchanged':
+            self.unchanged_count += 1
+            self.stats.count('unchanged files')
+            return
+        if status == 'new' and self.index.contains(object_name):
+            # Imported before the manifest existed, take it over instead of importing it again
+            self.manifest.record(manifest_key, item_path, [self.index.get_object(object_name)])
+            self.unchanged_count += 1
+            self.stats.count('adopted files')
+            return
+        if object_name in self.queued_names:
+            self.stats.log(f"Skipping {item_path} as another file already imports {object_name}")
+            self.stats.count('duplicate names')
+            return
+        self.queued_names.add(object_name)
+        self.pending_files.append((item_path, collection_path, manifest_key))
+
+    # Queues files by their path relative to the depot instead of scanning the folder tree.
+    # The caller decides which files to import, e.g. one shard of a headless build or a level's dependencies.
+    def queue_files(self, relative_paths):
+        for relative_path in relative_paths:
+            self.queue_file(str(self.depot_path / relative_path), relative_path)
+        self.stats.count('queued files', self.total)
+        return self.total
+
+    # Changed files replace whatever their previous import produced. A shared mesh that goes with it
+    # is dropped from the lookup too, so later files with the same geometry build a new one.
+    def remove_previous_import(self, manifest_key):
+        shared = {}
+        entry = self.manifest.entries.get(manifest_key)
+        if entry and self.shared_meshes:
+            for name in entry['meshes']:
+                mesh = bpy.data.meshes.get(name)
+                fingerprint = mesh.get(FINGERPRINT_PROP) if mesh else None
+                if fingerprint and self.shared_meshes.get(fingerprint) == mesh:
+                    shared[name] = fingerprint
+        self.index.forget(self.manifest.remove_imported_data(manifest_key))
+        for name, fingerprint in shared.items():
+            if name not in bpy.data.meshes:
+                del self.shared_meshes[fingerprint]
+
+    # Files are parsed by worker processes, only mesh and collection work happens here on the main thread
+    def start(self):
+        self.targets = {file_path: (collection_path, manifest_key) for file_path, collection_path, manifest_key in self.pending_files}
+        self.pool = ParsePool(self.worker_count)
+        self.pool.start()
+        self.parsed_files = self.pool.imap([file_path for file_path, collection_path, manifest_key in self.pending_files])
+
+    # Imports up to max_files parsed files, returns True once every file has been handled
+    def step(self, max_files=None):
+        handled = 0
+        while max_files is None or handled < max_files:
+            # With worker processes this is only the time spent waiting for the next parsed file
+            with self.stats.stage('parse'):
+                parsed = next(self.parsed_files, None)
+            if parsed is None:
+                return True
+            try:
+                self.import_pskx(parsed, *self.targets[parsed.path])
+            finally:
+                parsed.release()
+            handled += 1
+            self.processed_count += 1
+        return self.processed_count >= self.total
+
+    def import_pskx(self, parsed, collection_path, manifest_key):
+        self.stats.log(f"Importing: {parsed.path} into collection {Path('GenericBrowser', *collection_path)}")
+        self.remove_previous_import(manifest_key)
         try:
-            pskimport(file_path, bReorientBones=False)
-            for obj in bpy.context.selected_objects:
-                self.create_nested_collections_and_link(obj, collection_path)
-                self.set_second_uv_channel(obj)
-                self.set_auto_smooth(obj)
+            content_hash = parsed.data.content_hash if parsed.data is not None else None
+            objects = self.import_pskx_objects(parsed)
+            if objects:
+                self.imported_batch.append((manifest_key, parsed.path, collection_path, objects, content_hash or hash_file(parsed.path)))
         except Exception as e:
-            print(f"Error importing {file_path}: {e}")
-
-    def create_nested_collections_and_link(self, obj, collection_path):
-        parent_collection = bpy.context.scene.collection
-        for part in collection_path.parts:
-            parent_collection = self.ensure_collection_exists(part, parent_collection)
-        if obj.name not in parent_collection.objects:
-            while obj.users_collection:
-                obj.users_collection[0].objects.unlink(obj)
-            parent_collection.objects.link(obj)
-
-    def cleanup_object_names(self, collection):
-        for obj in collection.objects:
-            obj.name = obj.name[:-3] if obj.name[-3:] == '.mo' else obj.name
-            self.report({'INFO'}, obj.name)
-        for sub_collection in collection.children:
-            self.cleanup_object_names(sub_collection)
-
-    def set_second_uv_channel(self, obj):
-        if obj.type == 'MESH':
-            mesh = obj.data
-            if len(mesh.uv_layers) > 1:
-                mesh.uv_layers.active_index = 1
-                mesh.uv_layers[1].active_render = True
-
-    def set_auto_smooth(self, obj):
-        if obj.type == 'MESH':
-            bpy.context.view_layer.objects.active = obj
-            bpy.ops.object.shade_smooth(use_auto_smooth=True)
-            obj.data.auto_smooth_angle = 3.14159 / 4  # 45 degrees in radians
+            print(f"Error importing {parsed.path}: {e}")
+            self.stats.count('errors')
+        if len(self.imported_batch) >= POST_PROCESS_BATCH_SIZE:
+            self.flush_imported_batch()
+
+    # New objects are finished in batches: data-level post-processing, then collection links and manifest entries
+    def flush_imported_batch(self):
+        if not self.imported_batch:
+            return
+        with self.stats.stage('finalize'):
+            finalize_imported_objects([obj for entry in self.imported_batch for obj in entry[3]])
+        with self.stats.stage('collection link'):
+            for manifest_key, file_path, collection_path, objects, content_hash in self.imported_batch:
+                for obj in objects:
+                    self.index.link(obj, collection_path)
+                self.manifest.record(manifest_key, file_path, objects, content_hash)
+                self.imported_count += 1
+        self.stats.count('imported files', len(self.imported_batch))
+        self.imported_batch = []
+
+    def import_pskx_objects(self, parsed):
+        if parsed.data is not None:
+            name = Path(parsed.path).stem
+            with self.stats.stage('mesh build'):
+                return [bpy.data.objects.new(name, self.get_or_build_mesh(name, parsed.data))]
+        if not parsed.unsupported:
+            print(f"Error importing {parsed.path}: {parsed.error}")
+            self.stats.count('errors')
+            return []
+        # Fall back to the PSK import script for anything the native reader does not understand
+        self.stats.log(f"Falling back to pskimport for {parsed.path}: {parsed.error}")
+        self.stats.count('pskimport fallbacks')
+        with self.stats.stage('pskimport'):
+            pskimport(parsed.path, bReorientBones=False)
+        objects = list(bpy.context.selected_objects)
+        for obj in objects:
+            if obj.type == 'MESH':
+                mark_sharp_edges_by_angle(obj.data)
+                if self.material_remap:
+                    remap_mesh_materials(obj.data, self.material_remap)
+        return objects
+
+    def get_or_build_mesh(self, name, data):
+        arrays = MeshArrays(data)
+        if self.shared_meshes is None:
+            return build_mesh(name, arrays, self.material_remap)
+
+        fingerprint = arrays.fingerprint()
+        mesh = self.shared_meshes.get(fingerprint)
+        if mesh:
+            self.shared_mesh_count += 1
+            self.shared_mesh_bytes += arrays.nbytes()
+            self.stats.count('shared meshes')
+            return mesh
+
+        mesh = build_mesh(name, arrays, self.material_remap)
+        mesh[FINGERPRINT_PROP] = fingerprint
+        self.shared_meshes[fingerprint] = mesh
+        return mesh
+
+    def finish(self):
+        if self.parsed_files is not None:
+            # Closing the generator releases the shared blocks of files that were never imported
+            self.parsed_files.close()
+            self.parsed_files = None
+        if self.pool:
+            self.stats.count('parse fallbacks', self.pool.fallback_count)
+            self.pool.shutdown()
+            self.pool = None
+        try:
+            self.flush_imported_batch()
+        finally:
+            with self.stats.stage('manifest save'):
+                self.manifest.save()
+
+    def run(self):
+        self.scan()
+        self.import_queued()
+
+    def import_queued(self):
+        self.start()
+        try:
+            self.step()
+        finally:
+            self.finish()
+
+    def summary(self):
+        message = f"Imported {self.imported_count} files, {self.unchanged_count} were up to date."
+        if self.shared_meshes is not None:
+            message += f" Shared {self.shared_mesh_count} identical meshes, saving about {self.shared_mesh_bytes / (1024 * 1024):.1f} MB."
+        return message
+
+class MassImportOperator(Operator):
+    bl_idname = "object.mass_import_operator"
+    bl_label = "Import PSKX Files"
 
     def execute(self, context):
         props = context.scene.mass_import_props
         folder_path = Path(props.folder_path)
-        depot_path = Path(props.depot_path)
-        skip_lod_files = props.skip_lod_files
 
         if not folder_path.exists():
             self.report({'ERROR'}, f"Folder path does not exist: {folder_path}")
             return {'CANCELLED'}
 
-        generic_browser = self.ensure_collection_exists("GenericBrowser", bpy.context.scene.collection)
-        self.process_folder(folder_path, generic_browser, depot_path, skip_lod_files)
+        if props.use_library_cache:
+            cache_dir = get_cache_dir(props)
+            stats = RunStats("library_cache", props.verbose_logging)
+            message = import_from_library_cache(props, cache_dir, stats)
+            stats.write_report(cache_dir)
+            self.report({'INFO'}, f"Import completed from the library cache. {message}")
+            return {'FINISHED'}
 
-        # Clean up object names to remove .mo postfix
-        self.cleanup_object_names(generic_browser)
+        job = DepotImportJob.from_props(props)
+        job.run()
 
         bpy.context.view_layer.update()
-        bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
-        self.report({'INFO'}, "Import completed successfully.")
+        # There is no window to redraw under blender -b, the operator is also run from the benchmark there
+        if not bpy.app.background:
+            bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
+        job.stats.write_report(get_cache_dir(props))
+        self.report({'INFO'}, f"Import completed successfully. {job.summary()}")
 
         return {'FINISHED'}
 
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class MassImportModalOperator(Operator):
+    bl_idname = "object.mass_import_modal"
+    bl_label = "Import PSKX Files (Interactive)"
+    bl_description = "Import PSKX files a few at a time while Blender stays responsive. Press Esc to stop"
+
+    def invoke(self, context, event):
+        props = context.scene.mass_import_props
+        folder_path = Path(props.folder_path)
+
+        if not folder_path.exists():
+            self.report({'ERROR'}, f"Folder path does not exist: {folder_path}")
+            return {'CANCELLED'}
+        # Libraries are built by background processes, there is nothing to spread over UI ticks
+        if props.use_library_cache:
+            return bpy.ops.object.mass_import_operator()
+
+        self.job = DepotImportJob.from_props(props)
+        self.cache_dir = get_cache_dir(props)
+        self.job.scan()
+        self.job.start()
+        self.files_per_tick = props.files_per_tick
+        self.redraw_interval = props.redraw_interval
+        self.next_redraw = self.redraw_interval
+        self.start_time = time.monotonic()
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(1, self.job.total))
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.finish(context)
+            self.report({'WARNING'}, f"Import cancelled after {self.job.processed_count} of {self.job.total} files. {self.job.summary()}")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            done = self.job.step(self.files_per_tick)
+            context.window_manager.progress_update(self.job.processed_count)
+            context.workspace.status_text_set(self.status_text())
+
+            # Objects only show up in the viewport when their batch is linked, so link and redraw together
+            if done or self.job.processed_count >= self.next_redraw:
+                self.job.flush_imported_batch()
+                self.job.manifest.save()
+                context.view_layer.update()
+                for area in context.screen.areas:
+                    area.tag_redraw()
+                self.next_redraw = self.job.processed_count + self.redraw_interval
+        except Exception:
+            # Stop the timer and the workers and keep what was imported so far, like a cancelled import
+            self.finish(context)
+            raise
+
+        if done:
+            self.finish(context)
+            self.report({'INFO'}, f"Import completed successfully. {self.job.summary()}")
+            return {'FINISHED'}
+        return {'RUNNING_MODAL'}
+
+    def status_text(self):
+        processed = self.job.processed_count
+        total = self.job.total
+        elapsed = time.monotonic() - self.start_time
+        text = f"Importing PSKX files: {processed}/{total}, elapsed {format_duration(elapsed)}"
+        if processed:
+            text += f", ETA {format_duration(elapsed / processed * (total - processed))}"
+        return text + " (Esc to cancel)"
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self.job.finish()
+        context.view_layer.update()
+        self.job.stats.write_report(self.cache_dir)
+
 def register():
     register_class(MassImportOperator)
+    register_class(MassImportModalOperator)
 
 def unregister():
+    unregister_class(MassImportModalOperator)
     unregister_class(MassImportOperator)
 
 if __name__ == "__main__":
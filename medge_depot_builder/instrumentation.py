@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORTS_FOLDER_NAME = "reports"
+
+# Wall time per named stage and event counters of one operator run.
+# Stages can be entered many times, their time and call count add up.
+# Per-item messages go through log() and are only printed with verbose logging on.
+class RunStats:
+    def __init__(self, name, verbose=False):
+        self.name = name
+        self.verbose = verbose
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+        self.total_seconds = None
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def finish(self):
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self.start_time
+        return self
+
+    def to_dict(self):
+        self.finish()
+        return {
+            'operation': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': self.total_seconds,
+            'stages': self.stages,
+            'counters': self.counters,
+        }
+
+    def summary(self):
+        self.finish()
+        parts = [f"{self.name} {self.total_seconds:.2f}s"]
+        if self.stages:
+            parts.append(", ".join(f"{name} {stage['seconds']:.2f}s" for name, stage in self.stages.items()))
+        if self.counters:
+            parts.append(", ".join(f"{name} {value}" for name, value in sorted(self.counters.items())))
+        return " | ".join(parts)
+
+    # Writes <cache>/reports/<name>_<timestamp>.json and prints the one-line summary, returns the report path
+    def write_report(self, cache_dir):
+        reports_dir = os.path.join(cache_dir, REPORTS_FOLDER_NAME)
+        report_path = os.path.join(reports_dir, f"{self.name}_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(reports_dir, exist_ok=True)
+            with open(report_path, 'w') as file:
+                json.dump(self.to_dict(), file, indent=1)
+        except OSError as e:
+            print(f"Could not write run report {report_path}: {e}")
+            report_path = None
+        print(self.summary())
+        return report_path
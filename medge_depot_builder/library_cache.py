@@ -0,0 +1,256 @@
+import bpy
+import json
+import os
+import subprocess
+from pathlib import Path, PurePath
+from .import_index import ImportIndex
+from .import_manifest import hash_file
+from .parse_pool import get_worker_count
+from .mat_pipeline import parse_mat_files
+from .texture_resolver import TextureResolver
+from .depot_catalog import DepotCatalog
+
+LIBRARY_FOLDER_NAME = "libraries"
+SIGNATURE_VERSION = 2
+# Files whose changes make a package library stale: meshes, materials and the textures the materials load
+LIBRARY_SOURCE_EXTENSIONS = ('.pskx', '.mat', '.png')
+HEADLESS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "headless.py")
+
+# Build settings that change what ends up in a library, a library built with other settings is stale
+def get_build_options(props):
+    return {
+        'include_lods': not props.skip_lod_files,
+        'deduplicate_meshes': props.deduplicate_meshes,
+        'full_resolution': not props.use_texture_proxies,
+        'proxy_size': props.proxy_size,
+        'bake_textures': props.bake_texture_conversions,
+        'consolidate_materials': props.consolidate_materials,
+    }
+
+# One depot package folder built into its own .blend in the cache folder.
+# The signature next to it records the build options and the size, mtime and hash of every source
+# file the library was built from, including textures its materials resolve from other packages.
+class PackageLibrary:
+    def __init__(self, depot_path, package_path, cache_dir):
+        self.depot_path = os.path.abspath(depot_path)
+        self.package_path = os.path.abspath(package_path)
+        self.parts = Path(os.path.relpath(self.package_path, self.depot_path)).parts
+        library_dir = os.path.join(cache_dir, LIBRARY_FOLDER_NAME)
+        file_name = "__".join(self.parts)
+        self.blend_path = os.path.join(library_dir, file_name + ".blend")
+        self.signature_path = os.path.join(library_dir, file_name + ".json")
+        self.material_list_path = os.path.join(library_dir, file_name + "_materials.txt")
+        self.files = {}
+        self.options = {}
+        self.external_materials = []
+
+    @property
+    def name(self):
+        return self.parts[-1]
+
+    def scan_files(self, skip_lod_files):
+        self.files = {}
+        for directory, directory_names, file_names in os.walk(self.package_path):
+            directory_names.sort()
+            for file_name in sorted(file_names):
+                if not file_name.lower().endswith(LIBRARY_SOURCE_EXTENSIONS):
+                    continue
+                if skip_lod_files and file_name.endswith('.pskx') and '_lod' in file_name.lower():
+                    continue
+                path = os.path.join(directory, file_name)
+                stat = os.stat(path)
+                self.files[Path(os.path.relpath(path, self.package_path)).as_posix()] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        return self.files
+
+    def add_file(self, path):
+        relative_path = Path(os.path.relpath(path, self.package_path)).as_posix()
+        if relative_path not in self.files and os.path.isfile(path):
+            stat = os.stat(path)
+            self.files[relative_path] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    # Materials the package's meshes use from other packages. They are built into the library too,
+    # a placeholder in a linked library could never be replaced by the real material.
+    def add_external_materials(self, catalog):
+        mesh_names = {PurePath(relative_path).stem for relative_path in self.files if relative_path.endswith('.pskx')}
+        meshes, materials, textures, missing = catalog.closure(mesh_names)
+        self.external_materials = []
+        for relative_path in materials:
+            path = os.path.join(self.depot_path, relative_path)
+            if os.path.commonpath([self.package_path, os.path.abspath(path)]) != self.package_path:
+                self.external_materials.append(path)
+                self.add_file(path)
+
+    # Files outside the package are recorded relative to it as well, as ../OtherPackage/...
+    def add_external_textures(self, resolver):
+        mat_paths = [os.path.join(self.package_path, relative_path) for relative_path in self.files if relative_path.endswith('.mat')]
+        for record in parse_mat_files(mat_paths, resolver):
+            for path in record.resolved.values():
+                if path:
+                    self.add_file(path)
+
+    def has_meshes(self):
+        return any(relative_path.endswith('.pskx') for relative_path in self.files)
+
+    def load_signature(self):
+        try:
+            with open(self.signature_path, 'r') as file:
+                signature = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if signature.get('version') != SIGNATURE_VERSION or signature.get('options') != self.options:
+            return None
+        return signature.get('files')
+
+    # Only files whose size or mtime moved are hashed, a touched but identical file keeps the library current
+    def is_current(self):
+        if not os.path.isfile(self.blend_path):
+            return False
+        signature = self.load_signature()
+        if signature is None or signature.keys() != self.files.keys():
+            return False
+        for relative_path, entry in self.files.items():
+            recorded = signature[relative_path]
+            if entry['size'] == recorded['size'] and entry['mtime'] == recorded['mtime']:
+                entry['hash'] = recorded['hash']
+                continue
+            entry['hash'] = hash_file(os.path.join(self.package_path, relative_path))
+            if entry['hash'] != recorded['hash']:
+                return False
+        # Refresh the recorded mtimes so the same files are not hashed again next time
+        self.save_signature()
+        return True
+
+    def save_signature(self):
+        for relative_path, entry in self.files.items():
+            if 'hash' not in entry:
+                entry['hash'] = hash_file(os.path.join(self.package_path, relative_path))
+        temp_path = self.signature_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'version': SIGNATURE_VERSION, 'options': self.options, 'files': self.files}, file)
+        os.replace(temp_path, self.signature_path)
+
+    def build_command(self, props, cache_dir):
+        command = [
+            bpy.app.binary_path, '-b', '--factory-startup', '--python', HEADLESS_SCRIPT, '--',
+            'build', self.depot_path,
+            '--folder', self.package_path,
+            '--materials', self.package_path,
+            '--output', self.blend_path,
+            '--cache', cache_dir,
+            '--shards', '1',
+            '--workers', '1',
+            '--proxy-size', str(props.proxy_size),
+            # Stale libraries are built from scratch, an update through the manifest would keep
+            # unchanged files with the meshes, proxies and images of the old options
+            '--fresh',
+        ]
+        if self.external_materials:
+            with open(self.material_list_path, 'w') as file:
+                file.write("\n".join(self.external_materials))
+            command += ['--material-list', self.material_list_path]
+        if not props.skip_lod_files:
+            command.append('--include-lods')
+        if props.deduplicate_meshes:
+            command.append('--deduplicate-meshes')
+        if not props.use_texture_proxies:
+            command.append('--full-resolution')
+        if props.bake_texture_conversions:
+            command.append('--bake-textures')
+        if props.consolidate_materials:
+            command.append('--consolidate-materials')
+        return command
+
+def find_package_libraries(props, cache_dir):
+    depot_path = bpy.path.abspath(props.depot_path)
+    folder_path = bpy.path.abspath(props.folder_path)
+    packages = []
+    for name in sorted(os.listdir(folder_path)):
+        path = os.path.join(folder_path, name)
+        if os.path.isdir(path) and os.path.abspath(path) != os.path.abspath(cache_dir):
+            packages.append(PackageLibrary(depot_path, path, cache_dir))
+    return packages
+
+# Builds the stale libraries in background Blender processes, several packages at a time.
+# Returns the libraries that failed to build.
+def build_libraries(libraries, props, cache_dir, stats):
+    os.makedirs(os.path.join(cache_dir, LIBRARY_FOLDER_NAME), exist_ok=True)
+    max_running = get_worker_count(props.worker_count)
+    queue = list(libraries)
+    running = []
+    failed = []
+    while queue or running:
+        while queue and len(running) < max_running:
+            library = queue.pop(0)
+            log = open(os.path.splitext(library.blend_path)[0] + ".log", 'w')
+            process = subprocess.Popen(library.build_command(props, cache_dir), stdout=log, stderr=subprocess.STDOUT)
+            running.append((library, process, log))
+        library, process, log = running.pop(0)
+        return_code = process.wait()
+        log.close()
+        if return_code == 0:
+            library.save_signature()
+            stats.log(f"Built library {library.blend_path}")
+        else:
+            print(f"Building the library of {library.package_path} failed with exit code {return_code}, see {log.name}")
+            failed.append(library)
+    return failed
+
+# Links or appends the package collection of each library below its depot folder in GenericBrowser.
+# Packages already in the tree are left alone, linked ones are reloaded when their library was rebuilt.
+def load_libraries(libraries, rebuilt, link, stats):
+    index = ImportIndex("GenericBrowser")
+    loaded_count = 0
+    for library in libraries:
+        if not os.path.isfile(library.blend_path):
+            continue
+        existing = index.collections.get(library.parts)
+        if existing and (existing.library or existing.all_objects):
+            if existing.library and library in rebuilt:
+                existing.library.reload()
+            continue
+        if existing:
+            # An empty folder collection left by an earlier scan makes way for the library's
+            bpy.data.collections.remove(existing)
+
+        with bpy.data.libraries.load(library.blend_path, link=link) as (data_from, data_to):
+            data_to.collections = [name for name in data_from.collections if name == library.name]
+        collection = data_to.collections[0] if data_to.collections else None
+        if not collection:
+            print(f"No {library.name} collection found in {library.blend_path}")
+            stats.count('broken libraries')
+            continue
+        index.get_collection(library.parts[:-1]).children.link(collection)
+        index.collections[library.parts] = collection
+        loaded_count += 1
+    return loaded_count
+
+def import_from_library_cache(props, cache_dir, stats):
+    libraries = find_package_libraries(props, cache_dir)
+    options = get_build_options(props)
+    with stats.stage('signature'):
+        depot_path = bpy.path.abspath(props.depot_path)
+        resolver = TextureResolver(depot_path, cache_dir).load()
+        catalog = DepotCatalog(depot_path, cache_dir).load()
+        stale = []
+        for library in libraries:
+            library.options = options
+            library.scan_files(props.skip_lod_files)
+            if not library.has_meshes():
+                continue
+            library.add_external_materials(catalog)
+            library.add_external_textures(resolver)
+            if not library.is_current():
+                stale.append(library)
+    libraries = [library for library in libraries if library.has_meshes()]
+    stats.count('packages', len(libraries))
+    stats.count('stale libraries', len(stale))
+
+    with stats.stage('library build'):
+        failed = build_libraries(stale, props, cache_dir, stats)
+    stats.count('failed libraries', len(failed))
+
+    link = props.library_link_mode == 'LINK'
+    with stats.stage('link' if link else 'append'):
+        loaded_count = load_libraries(libraries, set(stale), link, stats)
+    stats.count('loaded libraries', loaded_count)
+    return f"{len(libraries)} packages, {len(stale) - len(failed)} libraries rebuilt, {len(failed)} failed, {loaded_count} {'linked' if link else 'appended'}."
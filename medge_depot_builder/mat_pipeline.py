@@ -0,0 +1,91 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+TEXTURE_EXTENSION = '.png'
+
+# Plain record of one .mat file: the texture names it references and where they were found
+class MatRecord:
+    def __init__(self, path):
+        self.path = path
+        self.directory, filename = os.path.split(path)
+        self.name = os.path.splitext(filename)[0]
+        self.content_hash = None
+        self.textures = {}
+        self.resolved = {}
+        # Texture keys whose resolved path is a baked copy that needs no conversion nodes
+        self.baked = set()
+        self.errors = []
+
+def parse_mat_contents(record, contents):
+    for line_number, line in enumerate(contents.decode('utf-8', errors='replace').splitlines(), 1):
+        line = line.strip()
+        if not line or '=' not in line:
+            continue
+        # Only the first '=' separates key and value, values may contain more of them
+        key, value = line.split('=', 1)
+        key = key.strip()
+        value = value.strip()
+        if not key or not value:
+            record.errors.append(f"line {line_number}: incomplete entry '{line}'")
+            continue
+        record.textures[key] = value
+
+# Texture next to the .mat file first, then the depot index
+def resolve_textures(record, resolver):
+    for key, texture_name in record.textures.items():
+        filename = texture_name + TEXTURE_EXTENSION
+        local_path = os.path.join(record.directory, filename)
+        if os.path.isfile(local_path):
+            record.resolved[key] = local_path
+        else:
+            record.resolved[key] = resolver.resolve(filename, record.directory)
+
+def parse_mat_file(path, resolver):
+    record = MatRecord(path)
+    try:
+        with open(path, 'rb') as file:
+            contents = file.read()
+    except OSError as e:
+        record.errors.append(f"could not be read: {e}")
+        return record
+    record.content_hash = hashlib.blake2b(contents, digest_size=16).hexdigest()
+    parse_mat_contents(record, contents)
+    resolve_textures(record, resolver)
+    return record
+
+# Reads, parses and resolves every .mat file concurrently. Nothing here touches bpy,
+# the returned records are turned into materials on the main thread.
+def parse_mat_files(paths, resolver, max_workers=None):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda path: parse_mat_file(path, resolver), paths))
+
+def unique_texture_paths(records):
+    return sorted({path for record in records for path in record.resolved.values() if path})
+
+# Identifies a material by the textures it ends up using rather than by its name
+def texture_set_signature(record):
+    digest = hashlib.blake2b(digest_size=16)
+    for key in sorted(record.textures):
+        path = record.resolved.get(key)
+        value = os.path.normcase(os.path.abspath(path)) if path else f"missing:{record.textures[key]}"
+        digest.update(f"{key}={value}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+# Keeps the first record, in path order, of every texture set and maps the names of the others to it.
+# Records without textures are left alone, there is nothing to tell them apart by.
+# Returns the records to build and a {duplicate name: kept name} table.
+def consolidate_records(records):
+    kept_by_signature = {}
+    kept = []
+    remap = {}
+    for record in sorted(records, key=lambda record: record.path):
+        if not record.textures:
+            kept.append(record)
+            continue
+        first = kept_by_signature.setdefault(texture_set_signature(record), record)
+        if first is record:
+            kept.append(record)
+        elif first.name != record.name:
+            remap[record.name] = first.name
+    return kept, remap
@@ -0,0 +1,57 @@
+import bpy
+import json
+
+REMAP_TEXT_NAME = "medge_material_remap.json"
+REMAP_VERSION = 1
+
+# Material names consolidated into another material with the same textures, kept in a text
+# datablock so the table is saved with the .blend and applied to meshes imported later
+def load_material_remap():
+    text = bpy.data.texts.get(REMAP_TEXT_NAME)
+    if not text:
+        return {}
+    try:
+        remap = json.loads(text.as_string())
+    except ValueError as e:
+        print(f"Discarding unreadable material remap table: {e}")
+        return {}
+    if remap.get('version') != REMAP_VERSION:
+        return {}
+    return remap.get('materials', {})
+
+def save_material_remap(remap):
+    text = bpy.data.texts.get(REMAP_TEXT_NAME)
+    if not text:
+        if not remap:
+            return
+        text = bpy.data.texts.new(REMAP_TEXT_NAME)
+    text.from_string(json.dumps({'version': REMAP_VERSION, 'materials': remap}, indent=1, sort_keys=True))
+
+# Merges the result of one material import into the stored table. Names built as materials of
+# their own in this run drop out of it, so switching consolidation off builds them separately again.
+def update_material_remap(remap, built_names):
+    table = load_material_remap()
+    for name in built_names:
+        table.pop(name, None)
+    table.update(remap)
+    save_material_remap(table)
+    return table
+
+# Points every user of a consolidated material at the material it was merged into and removes it
+def apply_material_remap(remap):
+    merged_count = 0
+    for name, target_name in remap.items():
+        material = bpy.data.materials.get(name)
+        target = bpy.data.materials.get(target_name)
+        if material and target and material != target:
+            material.user_remap(target)
+            bpy.data.materials.remove(material)
+            merged_count += 1
+    return merged_count
+
+def remap_mesh_materials(mesh, remap):
+    for index, material in enumerate(mesh.materials):
+        if material and material.name in remap:
+            target = bpy.data.materials.get(remap[material.name])
+            if target:
+                mesh.materials[index] = target
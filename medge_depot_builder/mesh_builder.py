@@ -0,0 +1,186 @@
+import bpy
+import math
+import numpy as np
+from .fingerprint import fingerprint_arrays
+
+# Match the defaults pskimport uses so natively built meshes line up with previously imported ones
+POSITION_SCALE = 0.01
+FACE_CORNER_ORDER = [1, 0, 2]
+
+FINGERPRINT_PROP = "medge_fingerprint"
+# Edges between faces bent further than this are sharp when a mesh has no smoothing groups
+SHARP_EDGE_ANGLE = math.radians(45)
+
+# Per-loop arrays derived from parsed PSKX data, ready to be copied into a mesh
+class MeshArrays:
+    def __init__(self, data):
+        face_wedges = data.face_wedges[:, FACE_CORNER_ORDER]
+        face_points = data.wedge_points[face_wedges]
+
+        # Drop degenerate faces up front instead of leaving them for mesh.validate()
+        valid = ((face_points[:, 0] != face_points[:, 1]) &
+                 (face_points[:, 1] != face_points[:, 2]) &
+                 (face_points[:, 2] != face_points[:, 0]))
+        face_wedges = face_wedges[valid]
+
+        self.points = (data.points * POSITION_SCALE).astype(np.float32)
+        self.face_points = face_points[valid].astype(np.int32)
+        self.face_materials = data.face_materials[valid].astype(np.int32)
+        self.face_smoothing_groups = data.face_smoothing_groups[valid].astype(np.uint32)
+        self.loop_uvs = []
+        for wedge_uvs in [data.wedge_uvs] + data.extra_uvs:
+            loop_uvs = wedge_uvs[face_wedges].reshape(-1, 2).astype(np.float32)
+            loop_uvs[:, 1] = 1.0 - loop_uvs[:, 1]
+            self.loop_uvs.append(loop_uvs)
+        self.material_names = list(data.material_names)
+
+    def fingerprint(self):
+        arrays = [self.points, self.face_points, self.face_materials, self.face_smoothing_groups] + self.loop_uvs
+        return fingerprint_arrays(arrays, self.material_names)
+
+    # Rough size of the mesh data these arrays turn into
+    def nbytes(self):
+        return (self.points.nbytes + self.face_points.nbytes + self.face_materials.nbytes
+                + self.face_smoothing_groups.nbytes + sum(loop_uvs.nbytes for loop_uvs in self.loop_uvs))
+
+    # Keys of the edges on a smoothing group boundary, see edge_keys
+    def sharp_edge_keys(self):
+        corner_edges = np.stack([self.face_points, np.roll(self.face_points, -1, axis=1)], axis=2).reshape(-1, 2)
+        corner_faces = np.repeat(np.arange(len(self.face_points)), 3)
+        face_normals = None
+        if not self.face_smoothing_groups.any():
+            corners = self.points[self.face_points]
+            face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            lengths = np.linalg.norm(face_normals, axis=1, keepdims=True)
+            face_normals /= np.where(lengths > 0, lengths, 1)
+        return find_sharp_edges(edge_keys(corner_edges, len(self.points)), corner_faces, self.face_smoothing_groups, face_normals)
+
+# One integer per undirected edge, so edges can be matched without Blender's edge indices
+def edge_keys(edge_vertices, vertex_count):
+    edge_vertices = edge_vertices.astype(np.int64)
+    return edge_vertices.min(axis=1) * vertex_count + edge_vertices.max(axis=1)
+
+# Takes the edge and face of every face corner and returns the edges two faces meet at with a hard crease:
+# faces sharing no smoothing group, or faces bent further than SHARP_EDGE_ANGLE when there are no groups.
+# An edge used by more than two faces is sharp if any two faces next to each other in the sort disagree.
+def find_sharp_edges(corner_edges, corner_faces, face_smoothing_groups=None, face_normals=None):
+    order = np.argsort(corner_edges, kind='stable')
+    edges = corner_edges[order]
+    faces = corner_faces[order]
+    shared = np.flatnonzero(edges[1:] == edges[:-1])
+    first_faces = faces[shared]
+    second_faces = faces[shared + 1]
+    if face_smoothing_groups is not None and face_smoothing_groups.any():
+        sharp = (face_smoothing_groups[first_faces] & face_smoothing_groups[second_faces]) == 0
+    else:
+        sharp = np.einsum('ij,ij->i', face_normals[first_faces], face_normals[second_faces]) < math.cos(SHARP_EDGE_ANGLE)
+    return np.unique(edges[shared][sharp])
+
+# Writes a sharp flag per edge in one call. Blender 4.1 replaced auto smooth and the edge
+# property with a sharp_edge attribute that face smoothing respects directly.
+def write_sharp_edges(mesh, sharp):
+    if not sharp.any():
+        return 0
+    if bpy.app.version >= (4, 1, 0):
+        attribute = mesh.attributes.get("sharp_edge") or mesh.attributes.new("sharp_edge", 'BOOLEAN', 'EDGE')
+        attribute.data.foreach_set("value", sharp)
+    else:
+        mesh.edges.foreach_set("use_edge_sharp", sharp)
+    return int(sharp.sum())
+
+def mark_sharp_edges(mesh, sharp_keys):
+    edge_vertices = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_vertices)
+    return write_sharp_edges(mesh, np.isin(edge_keys(edge_vertices.reshape(-1, 2), len(mesh.vertices)), sharp_keys))
+
+# Meshes made by pskimport carry no smoothing groups here, their edges are marked by face angle
+def mark_sharp_edges_by_angle(mesh):
+    corner_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", corner_edges)
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    face_normals = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("normal", face_normals)
+    corner_faces = np.repeat(np.arange(len(mesh.polygons)), loop_totals)
+
+    sharp = np.zeros(len(mesh.edges), dtype=bool)
+    sharp[find_sharp_edges(corner_edges, corner_faces, face_normals=face_normals.reshape(-1, 3))] = True
+    return write_sharp_edges(mesh, sharp)
+
+# material_remap maps consolidated material names to the material they were merged into
+def build_mesh(name, arrays, material_remap=None):
+    face_count = len(arrays.face_points)
+    loop_count = face_count * 3
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays.points))
+    mesh.vertices.foreach_set("co", arrays.points.ravel())
+
+    mesh.loops.add(loop_count)
+    mesh.loops.foreach_set("vertex_index", arrays.face_points.ravel())
+
+    mesh.polygons.add(face_count)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, loop_count, 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", np.full(face_count, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("material_index", arrays.face_materials)
+
+    for index, loop_uvs in enumerate(arrays.loop_uvs):
+        uv_layer = mesh.uv_layers.new(name="UVMap" if index == 0 else f"EXTRAUVS{index - 1}")
+        uv_layer.data.foreach_set("uv", loop_uvs.ravel())
+
+    for material_name in arrays.material_names:
+        if material_remap:
+            material_name = material_remap.get(material_name, material_name)
+        material = bpy.data.materials.get(material_name)
+        if not material:
+            material = bpy.data.materials.new(name=material_name)
+        mesh.materials.append(material)
+
+    mesh.update(calc_edges=True)
+    mesh.validate()
+    mark_sharp_edges(mesh, arrays.sharp_edge_keys())
+    return mesh
+
+# Fingerprint of an existing mesh read back with foreach_get: positions, face corners, UVs and
+# material slots. Only meshes compared with each other through this function match.
+def mesh_geometry_fingerprint(mesh):
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    corners = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", corners)
+    loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+
+    arrays = [positions, corners, loop_starts]
+    for uv_layer in mesh.uv_layers:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uvs)
+        arrays.append(uvs)
+    material_names = [material.name if material else "" for material in mesh.materials]
+    return fingerprint_arrays(arrays, material_names)
+
+# Meshes built with deduplication on carry their fingerprint, so later runs can share them too
+def collect_fingerprinted_meshes():
+    return {mesh[FINGERPRINT_PROP]: mesh for mesh in bpy.data.meshes if FINGERPRINT_PROP in mesh}
+
+# Post-import pass over a batch of new objects. Everything is set on the data directly,
+# so there are no operator calls, active object changes or view layer updates per object.
+def finalize_imported_objects(objects):
+    meshes = {obj.data for obj in objects if obj.type == 'MESH'}
+
+    for obj in objects:
+        # pskimport names its objects <name>.mo
+        if obj.name[-3:] == '.mo':
+            obj.name = obj.name[:-3]
+
+    for mesh in meshes:
+        mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+        # Up to Blender 4.0 sharp edges only split normals with auto smooth on. The angle is left
+        # wide open so the marked edges alone decide, 4.1 and later need no setting or modifier.
+        if hasattr(mesh, "use_auto_smooth"):
+            mesh.use_auto_smooth = True
+            mesh.auto_smooth_angle = math.pi
+        if len(mesh.uv_layers) > 1:
+            mesh.uv_layers.active_index = 1
+            mesh.uv_layers[1].active_render = True
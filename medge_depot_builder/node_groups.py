@@ -0,0 +1,78 @@
+import bpy
+
+SPECULAR_GROUP_NAME = "MEDGE Specular to Roughness"
+NORMAL_GROUP_NAME = "MEDGE DirectX Normal"
+
+def new_group_socket(node_group, in_out, socket_type, name):
+    # Blender 4.0 moved group sockets to node_group.interface
+    if hasattr(node_group, "interface"):
+        return node_group.interface.new_socket(name, in_out=in_out, socket_type=socket_type)
+    sockets = node_group.inputs if in_out == 'INPUT' else node_group.outputs
+    return sockets.new(socket_type, name)
+
+def build_specular_group():
+    node_group = bpy.data.node_groups.new(SPECULAR_GROUP_NAME, 'ShaderNodeTree')
+    new_group_socket(node_group, 'INPUT', 'NodeSocketColor', "Specular")
+    new_group_socket(node_group, 'OUTPUT', 'NodeSocketFloat', "Roughness")
+    nodes = node_group.nodes
+    links = node_group.links
+
+    group_input = nodes.new('NodeGroupInput')
+    group_input.location = (-300, 0)
+    invert_node = nodes.new('ShaderNodeInvert')
+    invert_node.location = (0, 0)
+    group_output = nodes.new('NodeGroupOutput')
+    group_output.location = (300, 0)
+
+    links.new(invert_node.inputs['Color'], group_input.outputs['Specular'])
+    links.new(group_output.inputs['Roughness'], invert_node.outputs['Color'])
+    return node_group
+
+# UModel exports DirectX normal maps, the green channel is flipped to get an OpenGL normal
+def build_normal_group():
+    node_group = bpy.data.node_groups.new(NORMAL_GROUP_NAME, 'ShaderNodeTree')
+    new_group_socket(node_group, 'INPUT', 'NodeSocketColor', "Color")
+    new_group_socket(node_group, 'OUTPUT', 'NodeSocketVector', "Normal")
+    nodes = node_group.nodes
+    links = node_group.links
+
+    group_input = nodes.new('NodeGroupInput')
+    group_input.location = (-600, 0)
+
+    separate_rgb_node = nodes.new('ShaderNodeSeparateRGB')
+    separate_rgb_node.location = (-400, 0)
+    links.new(separate_rgb_node.inputs['Image'], group_input.outputs['Color'])
+
+    invert_green_node = nodes.new('ShaderNodeInvert')
+    invert_green_node.location = (-200, 0)
+    links.new(invert_green_node.inputs['Color'], separate_rgb_node.outputs['G'])
+
+    combine_rgb_node = nodes.new('ShaderNodeCombineRGB')
+    combine_rgb_node.location = (0, 0)
+    links.new(combine_rgb_node.inputs['R'], separate_rgb_node.outputs['R'])
+    links.new(combine_rgb_node.inputs['G'], invert_green_node.outputs['Color'])
+    links.new(combine_rgb_node.inputs['B'], separate_rgb_node.outputs['B'])
+
+    normal_map_node = nodes.new('ShaderNodeNormalMap')
+    normal_map_node.location = (200, 0)
+    links.new(normal_map_node.inputs['Color'], combine_rgb_node.outputs['Image'])
+
+    group_output = nodes.new('NodeGroupOutput')
+    group_output.location = (400, 0)
+    links.new(group_output.inputs['Normal'], normal_map_node.outputs['Normal'])
+    return node_group
+
+# The conversion chains live once in bpy.data.node_groups and every material instances them
+def get_node_group(name):
+    node_group = bpy.data.node_groups.get(name)
+    if node_group:
+        return node_group
+    if name == SPECULAR_GROUP_NAME:
+        return build_specular_group()
+    return build_normal_group()
+
+def new_group_node(nodes, group_name, location):
+    group_node = nodes.new('ShaderNodeGroup')
+    group_node.node_tree = get_node_group(group_name)
+    group_node.location = location
+    return group_node
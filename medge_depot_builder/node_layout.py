@@ -0,0 +1,108 @@
+import hashlib
+from collections import deque
+
+LAYOUT_HASH_PROP = "medge_layout_hash"
+COLUMN_WIDTH = 300
+ROW_HEIGHT = 300
+
+# Hash of the node names, types and links, locations are left out on purpose
+def structure_hash(node_tree):
+    digest = hashlib.blake2b(digest_size=16)
+    for node in sorted(node_tree.nodes, key=lambda node: node.name):
+        digest.update(f"{node.name}|{node.bl_idname}\n".encode('utf-8'))
+    links = sorted(
+        (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+        for link in node_tree.links
+    )
+    for link in links:
+        digest.update(("|".join(link) + "\n").encode('utf-8'))
+    return digest.hexdigest()
+
+# One topological pass: a node's depth is the longest chain of links feeding into it.
+# Returns the depths and the nodes in topological order, nodes caught in a cycle go last.
+def compute_depths(node_tree):
+    nodes = list(node_tree.nodes)
+    upstream = {node.name: [] for node in nodes}
+    downstream = {node.name: [] for node in nodes}
+    for link in node_tree.links:
+        upstream[link.to_node.name].append(link.from_node.name)
+        downstream[link.from_node.name].append(link.to_node.name)
+
+    remaining = {name: len(sources) for name, sources in upstream.items()}
+    depths = {node.name: 0 for node in nodes}
+    queue = deque(node.name for node in nodes if remaining[node.name] == 0)
+    order = []
+    while queue:
+        name = queue.popleft()
+        order.append(name)
+        for target in downstream[name]:
+            depths[target] = max(depths[target], depths[name] + 1)
+            remaining[target] -= 1
+            if remaining[target] == 0:
+                queue.append(target)
+
+    if len(order) < len(nodes):
+        ordered = set(order)
+        order.extend(node.name for node in nodes if node.name not in ordered)
+    return depths, order, upstream
+
+# Columns by depth, then every node with inputs is centred on the nodes feeding it
+def compute_layout(node_tree):
+    depths, order, upstream = compute_depths(node_tree)
+
+    positions = {}
+    column_rows = {}
+    for node in node_tree.nodes:
+        depth = depths[node.name]
+        row = column_rows.get(depth, 0)
+        column_rows[depth] = row + 1
+        positions[node.name] = [depth * COLUMN_WIDTH, -row * ROW_HEIGHT]
+
+    for name in order:
+        sources = upstream[name]
+        if sources:
+            positions[name][1] = sum(positions[source][1] for source in sources) / len(sources)
+    return positions
+
+def apply_layout(node_tree, positions):
+    for node in node_tree.nodes:
+        node.location = positions[node.name]
+
+def invalidate_layout(node_tree):
+    if LAYOUT_HASH_PROP in node_tree:
+        del node_tree[LAYOUT_HASH_PROP]
+
+# Taken before a tree is cleared and rebuilt. Rebuilding creates the nodes in the same order,
+# so an unchanged structure comes back with the same node names and the same hash.
+def capture_layout(node_tree):
+    return node_tree.get(LAYOUT_HASH_PROP), {node.name: tuple(node.location) for node in node_tree.nodes}
+
+# Puts the captured locations back when the rebuilt tree has the structure they were laid out for,
+# which keeps the stored hash valid so layout_node_trees skips the tree. Otherwise the tree is
+# marked for a new layout. Returns whether the layout was restored.
+def restore_layout(node_tree, captured):
+    layout_hash, locations = captured
+    if not layout_hash or structure_hash(node_tree) != layout_hash:
+        invalidate_layout(node_tree)
+        return False
+    for node in node_tree.nodes:
+        node.location = locations[node.name]
+    node_tree[LAYOUT_HASH_PROP] = layout_hash
+    return True
+
+# Lays out a batch of node trees in one call. Trees whose structure did not change since their
+# last layout are skipped, and trees sharing a structure reuse the layout computed for the first.
+def layout_node_trees(node_trees):
+    layouts = {}
+    laid_out = 0
+    for node_tree in node_trees:
+        tree_hash = structure_hash(node_tree)
+        if node_tree.get(LAYOUT_HASH_PROP) == tree_hash:
+            continue
+        positions = layouts.get(tree_hash)
+        if positions is None:
+            positions = layouts[tree_hash] = compute_layout(node_tree)
+        apply_layout(node_tree, positions)
+        node_tree[LAYOUT_HASH_PROP] = tree_hash
+        laid_out += 1
+    return laid_out
@@ -0,0 +1,208 @@
+import os
+import multiprocessing
+import runpy
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from .pskx_reader import PskxData, read_pskx, UnsupportedPskxError
+
+# Array fields of PskxData copied through shared memory, extra UV sets are appended as extra_uv_<n>
+ARRAY_FIELDS = ('points', 'wedge_points', 'wedge_uvs', 'face_wedges', 'face_materials', 'face_smoothing_groups')
+ALIGNMENT = 16
+
+# Parsed arrays never take more than about 1.5x the file size, the rest is alignment headroom
+def shared_memory_size(file_path):
+    return os.path.getsize(file_path) * 2 + 4096
+
+def get_worker_count(requested):
+    if requested > 0:
+        return requested
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def iter_arrays(data):
+    for field in ARRAY_FIELDS:
+        yield field, getattr(data, field)
+    for index, extra_uv in enumerate(data.extra_uvs):
+        yield f"extra_uv_{index}", extra_uv
+    if data.point_normals is not None:
+        yield 'point_normals', data.point_normals
+
+# Runs in the worker processes: parses a file and copies its arrays into a block created by the main process
+def parse_into_shared_memory(file_path, shm_name):
+    try:
+        data = read_pskx(file_path)
+    except UnsupportedPskxError as e:
+        return {'path': file_path, 'error': str(e), 'unsupported': True}
+    except Exception as e:
+        return {'path': file_path, 'error': str(e), 'unsupported': False}
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        layout = []
+        offset = 0
+        for field, array in iter_arrays(data):
+            array = np.ascontiguousarray(array)
+            offset = (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+            if offset + array.nbytes > shm.size:
+                return {'path': file_path, 'error': "Parsed data does not fit the shared buffer", 'unsupported': True}
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)
+            target[...] = array
+            layout.append((field, offset, array.dtype.str, array.shape))
+            offset += array.nbytes
+            del target
+    finally:
+        shm.close()
+
+    return {
+        'path': file_path,
+        'layout': layout,
+        'material_names': data.material_names,
+        'content_hash': data.content_hash,
+    }
+
+# A parsed file handed to the main thread, data views the shared block until release() is called
+class ParsedFile:
+    def __init__(self, path, data=None, error=None, unsupported=False, shm=None):
+        self.path = path
+        self.data = data
+        self.error = error
+        self.unsupported = unsupported
+        self.shm = shm
+
+    def release(self):
+        # The NumPy views have to go before the block can be closed
+        self.data = None
+        if self.shm:
+            try:
+                self.shm.close()
+            except BufferError:
+                # A caller still holds a view, the mapping goes away with it
+                pass
+            self.shm.unlink()
+            self.shm = None
+
+def parsed_from_shared_memory(result, shm):
+    if 'error' in result:
+        shm.close()
+        shm.unlink()
+        return ParsedFile(result['path'], error=result['error'], unsupported=result['unsupported'])
+
+    data = PskxData()
+    data.material_names = result['material_names']
+    data.content_hash = result['content_hash']
+    extra_uvs = {}
+    for field, offset, dtype, shape in result['layout']:
+        array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        if field.startswith('extra_uv_'):
+            extra_uvs[int(field[len('extra_uv_'):])] = array
+        else:
+            setattr(data, field, array)
+    data.extra_uvs = [extra_uvs[index] for index in sorted(extra_uvs)]
+    return ParsedFile(result['path'], data=data, shm=shm)
+
+def parse_in_process(file_path):
+    try:
+        return ParsedFile(file_path, data=read_pskx(file_path))
+    except UnsupportedPskxError as e:
+        return ParsedFile(file_path, error=str(e), unsupported=True)
+    except Exception as e:
+        return ParsedFile(file_path, error=str(e))
+
+# Parses PSKX files in worker processes while the caller builds meshes on the main thread.
+# At most max_pending files are in flight, so memory stays flat no matter how large the depot is.
+class ParsePool:
+    def __init__(self, worker_count=0, max_pending=None):
+        self.worker_count = get_worker_count(worker_count)
+        self.max_pending = max_pending or self.worker_count * 2
+        self.executor = None
+        # Files parsed on the main thread because their worker failed, and whether the pool broke
+        self.fallback_count = 0
+        self.broken = False
+
+    def start(self):
+        if self.worker_count <= 1 or self.executor:
+            return
+        # Workers are plain Python processes without bpy. The bootstrap script registers this package
+        # in them under the name it has here, which is not always the folder name, e.g. for extensions.
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        bootstrap_globals = {'package_name': __package__, 'package_dir': package_dir}
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(max_workers=self.worker_count, mp_context=context, initializer=runpy.run_path,
+                                            initargs=(os.path.join(package_dir, "worker_bootstrap.py"), bootstrap_globals))
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    # Yields a ParsedFile per path, in the order the paths were given.
+    # A file whose worker failed is parsed on the main thread instead, and once the pool is broken,
+    # e.g. a worker died or could not import the reader, all remaining files are.
+    def imap(self, file_paths):
+        if not self.executor:
+            for file_path in file_paths:
+                yield parse_in_process(file_path)
+            return
+
+        pending = deque()
+        paths = iter(file_paths)
+        try:
+            while True:
+                while len(pending) < self.max_pending and not self.broken:
+                    file_path = next(paths, None)
+                    if file_path is None:
+                        break
+                    shm = shared_memory.SharedMemory(create=True, size=shared_memory_size(file_path))
+                    try:
+                        future = self.executor.submit(parse_into_shared_memory, file_path, shm.name)
+                    except BrokenProcessPool:
+                        shm.close()
+                        shm.unlink()
+                        self.broken = True
+                        pending.append((file_path, None, None))
+                        break
+                    pending.append((file_path, shm, future))
+                if not pending:
+                    if self.broken:
+                        for file_path in paths:
+                            self.fallback_count += 1
+                            yield parse_in_process(file_path)
+                    return
+
+                file_path, shm, future = pending.popleft()
+                if future is None:
+                    self.fallback_count += 1
+                    yield parse_in_process(file_path)
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    shm.close()
+                    shm.unlink()
+                    self.broken = self.broken or isinstance(e, BrokenProcessPool)
+                    print(f"Parse worker failed on {file_path}, parsing it on the main thread: {e}")
+                    self.fallback_count += 1
+                    yield parse_in_process(file_path)
+                    continue
+                yield parsed_from_shared_memory(result, shm)
+        finally:
+            # Blocks of files that were never consumed, e.g. when the caller stops early
+            for file_path, shm, future in pending:
+                if future is None:
+                    continue
+                future.cancel()
+                try:
+                    future.result()
+                except (CancelledError, Exception):
+                    pass
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,190 @@
+import hashlib
+import numpy as np
+
+# Chunk header as written by UModel: char[20] id, int32 type flag, int32 item size, int32 item count
+CHUNK_HEADER = np.dtype([
+    ('chunk_id', 'S20'),
+    ('type_flag', '<i4'),
+    ('data_size', '<i4'),
+    ('data_count', '<i4'),
+])
+
+POINT_DTYPE = np.dtype([('co', '<f4', 3)])
+
+# Wedge layout depends on the wedge count: UModel switches to a 32-bit point index above 65536 wedges
+WEDGE16_DTYPE = np.dtype([
+    ('point_index', '<u2'),
+    ('pad', '<u2'),
+    ('u', '<f4'),
+    ('v', '<f4'),
+    ('material_index', 'u1'),
+    ('reserved', 'V3'),
+])
+WEDGE32_DTYPE = np.dtype([
+    ('point_index', '<u4'),
+    ('u', '<f4'),
+    ('v', '<f4'),
+    ('material_index', 'u1'),
+    ('reserved', 'V3'),
+])
+
+FACE16_DTYPE = np.dtype([
+    ('wedges', '<u2', 3),
+    ('material_index', 'u1'),
+    ('aux_material_index', 'u1'),
+    ('smoothing_groups', '<u4'),
+])
+FACE32_DTYPE = np.dtype([
+    ('wedges', '<u4', 3),
+    ('material_index', 'u1'),
+    ('aux_material_index', 'u1'),
+    ('smoothing_groups', '<u4'),
+])
+
+MATERIAL_DTYPE = np.dtype([
+    ('name', 'S64'),
+    ('texture_index', '<i4'),
+    ('poly_flags', '<u4'),
+    ('aux_material', '<i4'),
+    ('aux_flags', '<i4'),
+    ('lod_bias', '<i4'),
+    ('lod_style', '<i4'),
+])
+
+EXTRA_UV_DTYPE = np.dtype([('uv', '<f4', 2)])
+
+NORMAL_DTYPE = np.dtype([('normal', '<f4', 3)])
+
+HASH_DIGEST_SIZE = 16
+
+# Chunks that carry skeletal data; static meshes exported by UModel write them empty
+SKELETAL_CHUNKS = {b'REFSKELT', b'RAWWEIGHTS', b'RAWWEIGHT'}
+
+
+# Raised for files containing data the native reader does not understand
+class UnsupportedPskxError(Exception):
+    pass
+
+
+# Mesh data read from a PSKX file, kept as flat NumPy arrays
+class PskxData:
+    def __init__(self):
+        self.points = np.zeros((0, 3), dtype=np.float32)
+        self.wedge_points = np.zeros(0, dtype=np.uint32)
+        self.wedge_uvs = np.zeros((0, 2), dtype=np.float32)
+        self.face_wedges = np.zeros((0, 3), dtype=np.uint32)
+        self.face_materials = np.zeros(0, dtype=np.uint8)
+        self.face_smoothing_groups = np.zeros(0, dtype=np.uint32)
+        self.material_names = []
+        self.extra_uvs = []
+        self.point_normals = None
+        self.content_hash = None
+
+
+# Yields (chunk_id, data_size, data_count, offset) for every chunk in the buffer
+def iter_chunks(buffer):
+    offset = 0
+    total = len(buffer)
+    while offset + CHUNK_HEADER.itemsize <= total:
+        header = np.frombuffer(buffer, dtype=CHUNK_HEADER, count=1, offset=offset)[0]
+        chunk_id = header['chunk_id'].split(b'\0', 1)[0]
+        data_size = int(header['data_size'])
+        data_count = int(header['data_count'])
+        offset += CHUNK_HEADER.itemsize
+        end = offset + data_size * data_count
+        if end > total:
+            raise UnsupportedPskxError(f"Chunk {chunk_id!r} runs past the end of the file")
+        yield chunk_id, data_size, data_count, offset
+        offset = end
+
+
+def _read_array(buffer, dtype, data_size, data_count, offset, chunk_id):
+    if data_size != dtype.itemsize:
+        raise UnsupportedPskxError(f"Unexpected item size {data_size} for chunk {chunk_id!r}")
+    return np.frombuffer(buffer, dtype=dtype, count=data_count, offset=offset)
+
+
+def read_pskx_buffer(buffer):
+    data = PskxData()
+    wedges = None
+    faces = None
+
+    for chunk_id, data_size, data_count, offset in iter_chunks(buffer):
+        if chunk_id == b'ACTRHEAD':
+            continue
+        if chunk_id == b'PNTS0000':
+            points = _read_array(buffer, POINT_DTYPE, data_size, data_count, offset, chunk_id)
+            data.points = points['co']
+        elif chunk_id == b'VTXW0000':
+            dtype = WEDGE32_DTYPE if data_count > 65536 else WEDGE16_DTYPE
+            wedges = _read_array(buffer, dtype, data_size, data_count, offset, chunk_id)
+        elif chunk_id == b'FACE0000':
+            faces = _read_array(buffer, FACE16_DTYPE, data_size, data_count, offset, chunk_id)
+        elif chunk_id == b'FACE3200':
+            faces = _read_array(buffer, FACE32_DTYPE, data_size, data_count, offset, chunk_id)
+        elif chunk_id == b'MATT0000':
+            materials = _read_array(buffer, MATERIAL_DTYPE, data_size, data_count, offset, chunk_id)
+            data.material_names = decode_material_names(materials)
+        elif chunk_id.startswith(b'EXTRAUV'):
+            extra = _read_array(buffer, EXTRA_UV_DTYPE, data_size, data_count, offset, chunk_id)
+            data.extra_uvs.append(extra['uv'])
+        elif chunk_id == b'VTXNORMS':
+            normals = _read_array(buffer, NORMAL_DTYPE, data_size, data_count, offset, chunk_id)
+            data.point_normals = normals['normal']
+        elif chunk_id in SKELETAL_CHUNKS and data_count == 0:
+            continue
+        else:
+            raise UnsupportedPskxError(f"Unsupported chunk {chunk_id!r}")
+
+    if wedges is None or faces is None:
+        raise UnsupportedPskxError("File has no wedge or face data")
+
+    data.wedge_points = wedges['point_index'].astype(np.uint32)
+    data.wedge_uvs = np.column_stack((wedges['u'], wedges['v']))
+    data.face_wedges = faces['wedges'].astype(np.uint32)
+    data.face_materials = faces['material_index']
+    data.face_smoothing_groups = faces['smoothing_groups']
+
+    for extra_uv in data.extra_uvs:
+        if len(extra_uv) != len(data.wedge_points):
+            raise UnsupportedPskxError("Extra UV set does not match the wedge count")
+    if len(data.wedge_points) and data.wedge_points.max() >= len(data.points):
+        raise UnsupportedPskxError("Wedge references a point out of range")
+    if len(data.face_wedges) and data.face_wedges.max() >= len(data.wedge_points):
+        raise UnsupportedPskxError("Face references a wedge out of range")
+
+    return data
+
+
+def decode_material_names(materials):
+    return [name.split(b'\0', 1)[0].decode('latin-1') for name in materials['name']]
+
+# Reads only the chunk headers and the MATT chunk, skipping over the geometry
+def read_material_names(file_path):
+    with open(file_path, 'rb') as file:
+        while True:
+            header_bytes = file.read(CHUNK_HEADER.itemsize)
+            if len(header_bytes) < CHUNK_HEADER.itemsize:
+                return []
+            header = np.frombuffer(header_bytes, dtype=CHUNK_HEADER)[0]
+            chunk_id = header['chunk_id'].split(b'\0', 1)[0]
+            data_length = int(header['data_size']) * int(header['data_count'])
+            if chunk_id == b'MATT0000':
+                if int(header['data_size']) != MATERIAL_DTYPE.itemsize:
+                    raise UnsupportedPskxError(f"Unexpected item size {int(header['data_size'])} for chunk {chunk_id!r}")
+                buffer = file.read(data_length)
+                if len(buffer) < data_length:
+                    raise UnsupportedPskxError(f"Chunk {chunk_id!r} runs past the end of the file")
+                return decode_material_names(np.frombuffer(buffer, dtype=MATERIAL_DTYPE))
+            file.seek(data_length, 1)
+
+
+def hash_bytes(buffer):
+    return hashlib.blake2b(buffer, digest_size=HASH_DIGEST_SIZE).hexdigest()
+
+def read_pskx(file_path):
+    with open(file_path, 'rb') as file:
+        buffer = file.read()
+    data = read_pskx_buffer(buffer)
+    data.content_hash = hash_bytes(buffer)
+    return data
@@ -0,0 +1,104 @@
+import bpy
+import os
+from pathlib import PurePath
+from bpy.types import Operator
+from bpy.utils import register_class, unregister_class
+from .config import get_cache_dir
+from .depot_catalog import DepotCatalog
+from .import_pskx import DepotImportJob
+from .import_materials import create_materials
+from .texture_resolver import TextureResolver
+from .image_registry import ImageRegistry
+from .convert_prefabs import get_base_name
+from .instrumentation import RunStats
+
+# Names a placed object can refer to a depot mesh by: its own name, its mesh and its prefab
+def get_object_mesh_names(obj):
+    names = {get_base_name(obj.name)}
+    if obj.type == 'MESH':
+        names.add(get_base_name(obj.data.name))
+    actor = getattr(obj, 'medge_actor', None)
+    if actor and actor.type == 'STATIC_MESH' and actor.static_mesh.prefab:
+        names.add(get_base_name(actor.static_mesh.prefab.name))
+    return names
+
+def get_text_mesh_names(text):
+    names = set()
+    for line in text.as_string().splitlines():
+        line = line.strip()
+        if line:
+            names.add(PurePath(line).stem if line.endswith('.pskx') else line)
+    return names
+
+class ImportDependencies(Operator):
+    bl_idname = "object.import_dependencies"
+    bl_label = "Import Dependencies"
+    bl_description = "Import only the meshes used by the Level collection, the selection or a list, with the materials and textures they use"
+
+    def collect_mesh_names(self, context, props):
+        if props.selective_source == 'TEXT':
+            return get_text_mesh_names(props.mesh_list_text) if props.mesh_list_text else set()
+        if props.selective_source == 'SELECTED':
+            objects = context.selected_objects
+        else:
+            level_collection = bpy.data.collections.get("Level")
+            objects = level_collection.all_objects if level_collection else []
+        names = set()
+        for obj in objects:
+            names.update(get_object_mesh_names(obj))
+        return names
+
+    def execute(self, context):
+        props = context.scene.mass_import_props
+        depot_path = bpy.path.abspath(props.depot_path)
+        if not os.path.isdir(depot_path):
+            self.report({'ERROR'}, f"Depot path does not exist: {depot_path}")
+            return {'CANCELLED'}
+
+        mesh_names = self.collect_mesh_names(context, props)
+        if not mesh_names:
+            self.report({'ERROR'}, "No mesh names found to import")
+            return {'CANCELLED'}
+
+        cache_dir = get_cache_dir(props)
+        stats = RunStats("import_dependencies", props.verbose_logging)
+        with stats.stage('catalog'):
+            catalog = DepotCatalog(depot_path, cache_dir).load()
+        stats.count('catalog reread files', catalog.reread_files)
+
+        mesh_paths, mat_paths, texture_names, missing = catalog.closure(mesh_names)
+        stats.count('requested names', len(mesh_names))
+        stats.count('unknown names', len(missing))
+        for name in missing:
+            stats.log(f"No depot mesh named {name}")
+
+        job = DepotImportJob(depot_path, depot_path, props.skip_lod_files, props.worker_count, props.deduplicate_meshes, stats)
+        job.queue_files(mesh_paths)
+        job.import_queued()
+
+        with stats.stage('texture index'):
+            resolver = TextureResolver(depot_path, cache_dir).load()
+        registry = ImageRegistry(props.match_images_by_content, cache_dir if props.use_texture_proxies else None, props.proxy_size)
+        bake_dir = cache_dir if props.bake_texture_conversions else None
+        built_count, skipped_count, errors = create_materials([os.path.join(depot_path, path) for path in mat_paths], resolver, registry, stats, bake_dir, props.consolidate_materials)
+        for path, error in errors:
+            print(f"Error in {path}: {error}")
+        stats.count('textures referenced', len(texture_names))
+        stats.write_report(cache_dir)
+
+        context.view_layer.update()
+        message = (f"{len(mesh_paths)} meshes, {len(mat_paths)} materials and {len(texture_names)} textures needed. "
+                   f"{job.summary()} Built {built_count} materials, {skipped_count} were unchanged.")
+        if missing:
+            message += f" {len(missing)} names were not found in the depot."
+        self.report({'WARNING'} if errors else {'INFO'}, message)
+        return {'FINISHED'}
+
+def register():
+    register_class(ImportDependencies)
+
+def unregister():
+    unregister_class(ImportDependencies)
+
+if __name__ == "__main__":
+    register()
@@ -0,0 +1,69 @@
+import bpy
+import os
+import numpy as np
+from .import_manifest import hash_file
+
+BAKE_FOLDER_NAME = "baked_textures"
+# Texture keys of a .mat file whose shader conversion can be baked into the image, and how
+BAKED_CONVERSIONS = {
+    'Specular': 'roughness',
+    'Normal': 'normal',
+}
+
+# Baked files are named after a hash of the source contents, so an edited source gets a new
+# bake and identical sources in different folders share one
+def get_baked_path(cache_dir, source_path, conversion):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, BAKE_FOLDER_NAME, f"{name}_{conversion}_{hash_file(source_path)}.png")
+
+# Same math as the shader conversions, applied to the raw pixel values.
+# DirectX to OpenGL normal: flip green. Specular to roughness: invert color, keep alpha.
+def convert_pixels(pixels, conversion):
+    if conversion == 'normal':
+        pixels[:, 1] = 1.0 - pixels[:, 1]
+    else:
+        channels = min(3, pixels.shape[1])
+        pixels[:, :channels] = 1.0 - pixels[:, :channels]
+    return pixels
+
+# Returns the path of the converted copy and whether it was written now, or None if the source cannot be read
+def bake_texture(source_path, cache_dir, conversion):
+    baked_path = get_baked_path(cache_dir, source_path, conversion)
+    if os.path.isfile(baked_path):
+        return baked_path, False
+
+    try:
+        image = bpy.data.images.load(source_path, check_existing=False)
+    except RuntimeError as e:
+        print(f"Could not bake {source_path}: {e}")
+        return None, False
+    try:
+        pixels = np.empty(len(image.pixels), dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        pixels = convert_pixels(pixels.reshape(-1, image.channels), conversion)
+        image.pixels.foreach_set(pixels.ravel())
+        os.makedirs(os.path.dirname(baked_path), exist_ok=True)
+        image.filepath_raw = baked_path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+    return baked_path, True
+
+# Points the Specular and Normal textures of each record at their baked copies.
+# The keys that were swapped are added to record.baked, build_material links those without conversion nodes.
+def bake_record_textures(records, cache_dir, stats):
+    baked_paths = {}
+    for record in records:
+        for key, conversion in BAKED_CONVERSIONS.items():
+            source_path = record.resolved.get(key)
+            if not source_path:
+                continue
+            if (source_path, conversion) not in baked_paths:
+                baked_path, created = bake_texture(source_path, cache_dir, conversion)
+                baked_paths[(source_path, conversion)] = baked_path
+                stats.count('textures baked' if created else 'baked textures reused')
+            baked_path = baked_paths[(source_path, conversion)]
+            if baked_path:
+                record.resolved[key] = baked_path
+                record.baked.add(key)
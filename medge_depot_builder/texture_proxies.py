@@ -0,0 +1,81 @@
+import bpy
+import hashlib
+import os
+import struct
+
+PROXY_FOLDER_NAME = "texture_proxies"
+SOURCE_PATH_PROP = "medge_source_path"
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Proxies are named after the source path, its mtime and the proxy size, so a changed
+# source or a different size setting never picks up a stale file
+def get_proxy_path(cache_dir, source_path, max_size):
+    mtime = os.stat(source_path).st_mtime
+    key = f"{os.path.normcase(os.path.abspath(source_path))}|{mtime}|{max_size}"
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, PROXY_FOLDER_NAME, f"{name}_{digest}.png")
+
+# Textures that are small enough are used as they are and never get a proxy file
+def needs_proxy(source_path, cache_dir, max_size):
+    size = read_png_size(source_path)
+    if size and max(size) <= max_size:
+        return False
+    return not os.path.isfile(get_proxy_path(cache_dir, source_path, max_size))
+
+# Width and height from the IHDR chunk that follows the signature, None if the file is no PNG
+def read_png_size(path):
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(24)
+    except OSError:
+        return None
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+# Returns the path of a downscaled copy of the texture, generating it on first use.
+# Textures already within max_size are used as they are, the PNG header tells without decoding the image.
+def ensure_proxy(source_path, cache_dir, max_size):
+    size = read_png_size(source_path)
+    if size and max(size) <= max_size:
+        return source_path
+    proxy_path = get_proxy_path(cache_dir, source_path, max_size)
+    if os.path.isfile(proxy_path):
+        return proxy_path
+
+    image = bpy.data.images.load(source_path, check_existing=False)
+    try:
+        width, height = image.size
+        if max(width, height) <= max_size:
+            return source_path
+        scale = max_size / max(width, height)
+        image.scale(max(1, round(width * scale)), max(1, round(height * scale)))
+        os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+        image.filepath_raw = proxy_path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+    return proxy_path
+
+def is_proxy(image):
+    source_path = image.get(SOURCE_PATH_PROP)
+    return bool(source_path) and bpy.path.abspath(image.filepath) != source_path
+
+def load_full_resolution(image):
+    if not is_proxy(image):
+        return False
+    image.filepath = image[SOURCE_PATH_PROP]
+    image.reload()
+    return True
+
+def get_material_images(materials):
+    images = set()
+    for material in materials:
+        if not material or not material.use_nodes:
+            continue
+        for node in material.node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image:
+                images.add(node.image)
+    return images
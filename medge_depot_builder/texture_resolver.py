@@ -0,0 +1,125 @@
+import json
+import os
+
+INDEX_FILENAME = "texture_index.json"
+INDEX_VERSION = 1
+TEXTURE_EXTENSIONS = ('.png',)
+
+def shared_path_length(path_a, path_b):
+    try:
+        return len(os.path.commonpath([path_a, path_b]))
+    except ValueError:
+        # Paths on different drives share nothing
+        return 0
+
+# Maps texture file names to their locations in the depot.
+# The directory listing is persisted to the cache folder and only directories
+# whose mtime changed since the last run are listed again.
+class TextureResolver:
+    def __init__(self, depot_path, cache_dir):
+        self.depot_path = os.path.abspath(depot_path)
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        self.directories = {}
+        self.texture_paths = {}
+        self.ambiguous = {}
+        self.rescanned_directories = 0
+
+    def load(self):
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, 'r') as file:
+                    index = json.load(file)
+                if index.get('version') == INDEX_VERSION and index.get('depot_path') == self.depot_path:
+                    self.directories = index['directories']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Discarding unreadable texture index {self.index_path}: {e}")
+                self.directories = {}
+
+        self.refresh()
+        if self.rescanned_directories:
+            self.save()
+        return self
+
+    def save(self):
+        index = {
+            'version': INDEX_VERSION,
+            'depot_path': self.depot_path,
+            'directories': self.directories,
+        }
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self):
+        self.rescanned_directories = 0
+        if not self.directories:
+            if os.path.isdir(self.depot_path):
+                self.scan_directories([''])
+        else:
+            changed = []
+            for relative_dir, entry in list(self.directories.items()):
+                try:
+                    mtime = os.stat(os.path.join(self.depot_path, relative_dir)).st_mtime
+                except OSError:
+                    # Removed directories drop out of the index, their children fail the same way
+                    del self.directories[relative_dir]
+                    self.rescanned_directories += 1
+                    continue
+                if mtime != entry['mtime']:
+                    changed.append(relative_dir)
+            self.scan_directories(changed)
+        self.build_texture_paths()
+
+    def scan_directories(self, relative_dirs):
+        stack = list(relative_dirs)
+        while stack:
+            relative_dir = stack.pop()
+            abs_dir = os.path.join(self.depot_path, relative_dir)
+            if os.path.abspath(abs_dir) == self.cache_dir:
+                continue
+            files = []
+            try:
+                with os.scandir(abs_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            sub_dir = os.path.join(relative_dir, entry.name)
+                            if sub_dir not in self.directories:
+                                stack.append(sub_dir)
+                        elif entry.name.lower().endswith(TEXTURE_EXTENSIONS):
+                            files.append(entry.name)
+                mtime = os.stat(abs_dir).st_mtime
+            except OSError as e:
+                print(f"Could not list {abs_dir}: {e}")
+                continue
+            self.directories[relative_dir] = {'mtime': mtime, 'files': files}
+            self.rescanned_directories += 1
+
+    def build_texture_paths(self):
+        self.texture_paths = {}
+        for relative_dir in sorted(self.directories):
+            abs_dir = os.path.join(self.depot_path, relative_dir)
+            for filename in self.directories[relative_dir]['files']:
+                self.texture_paths.setdefault(filename, []).append(os.path.join(abs_dir, filename))
+
+    def resolve(self, filename, near_dir=None):
+        paths = self.texture_paths.get(filename)
+        if not paths:
+            return None
+        if len(paths) == 1:
+            return paths[0]
+
+        self.ambiguous[filename] = paths
+        if near_dir is None:
+            return paths[0]
+        # Prefer the candidate that shares the longest path with the referencing file
+        near_dir = os.path.abspath(near_dir)
+        return max(paths, key=lambda path: shared_path_length(near_dir, path))
+
+    def report_ambiguous(self):
+        for filename, paths in sorted(self.ambiguous.items()):
+            print(f"Ambiguous texture {filename}, found {len(paths)} candidates:")
+            for path in paths:
+                print(f"    {path}")
+        return len(self.ambiguous)
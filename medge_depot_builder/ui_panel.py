@@ -16,16 +16,47 @@ class MassImportPanel(Panel):
 
         layout.prop(props, "folder_path")
         layout.prop(props, "depot_path")
+        layout.prop(props, "cache_path")
+        layout.prop(props, "verbose_logging")
 
         layout.prop(props, "skip_lod_files")
+        layout.prop(props, "deduplicate_meshes")
+        layout.prop(props, "worker_count")
+
+        row = layout.row(align=True)
+        row.prop(props, "use_library_cache")
+        row.prop(props, "library_link_mode", text="")
+
+        row = layout.row(align=True)
+        row.prop(props, "files_per_tick")
+        row.prop(props, "redraw_interval")
 
         layout.operator("object.mass_import_operator")
+        layout.operator("object.mass_import_modal")
+
+        row = layout.row(align=True)
+        row.prop(props, "selective_source")
+        if props.selective_source == 'TEXT':
+            row.prop(props, "mesh_list_text", text="")
+        layout.operator("object.import_dependencies")
 
         layout.separator()
 
         # Material import section
         layout.prop(props, "material_folder_path")
-        layout.operator("material.import_mat_files")
+        row = layout.row(align=True)
+        row.prop(props, "use_texture_proxies")
+        row.prop(props, "proxy_size")
+        row = layout.row(align=True)
+        row.prop(props, "match_images_by_content")
+        row.prop(props, "bake_texture_conversions")
+        layout.prop(props, "consolidate_materials")
+        row = layout.row(align=True)
+        row.operator("material.import_mat_files")
+        row.operator("material.image_memory_report", text="Image Report")
+        row = layout.row(align=True)
+        row.operator("material.load_full_resolution_textures", text="Full Res: Selected").scope = 'SELECTED'
+        row.operator("material.load_full_resolution_textures", text="Full Res: Scene").scope = 'SCENE'
 
         layout.separator()
 
@@ -33,6 +64,8 @@ class MassImportPanel(Panel):
         row = layout.row()
         row.prop(props, "process_all_collections", text="Process All Collections")
         row.prop(props, "move_duplicates_to_level")
+        layout.prop(props, "prefab_match_mode")
+        layout.prop(props, "prefab_dry_run")
         layout.operator("object.convert_duplicates_to_prefabs")
 
         layout.separator()
@@ -0,0 +1,28 @@
+import importlib.util
+import os
+import sys
+import types
+
+# Run by every parse worker before its first task, with package_name and package_dir passed in as
+# globals. Registers the addon under the package name it has in Blender, e.g. a bl_ext.* name for an
+# extension, so the task functions the main process pickles by that name can be imported.
+# Nothing here may use a relative import, the file is run on its own.
+def register_package(package_name, package_dir):
+    if package_name in sys.modules:
+        return sys.modules[package_name]
+    parts = package_name.split('.')
+    for index in range(1, len(parts)):
+        parent_name = '.'.join(parts[:index])
+        if parent_name not in sys.modules:
+            parent = types.ModuleType(parent_name)
+            parent.__path__ = []
+            sys.modules[parent_name] = parent
+    spec = importlib.util.spec_from_file_location(package_name, os.path.join(package_dir, "__init__.py"),
+                                                  submodule_search_locations=[package_dir])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[package_name] = package
+    spec.loader.exec_module(package)
+    return package
+
+if 'package_name' in globals():
+    register_package(package_name, package_dir)